@@ -0,0 +1,197 @@
+"""
+Verification daemon: keeps a warm IzVerifier in memory, with its parsed containers, class map and
+reference sets, and serves requests to it over a Unix domain socket, so that IDE plugins and hooks
+don't parse the whole installer and source tree again for every question.
+
+Requests and responses are single lines of JSON:
+
+    {"method": "find_references", "params": {"rid": "some.string.id"}}
+    {"result": [["some.string.id", "path/to/File.java"], ...]}
+    {"error": "Unknown method: foo"}
+
+Sets are sent as sorted lists, and tuples as lists. Before each request, the verifier is refreshed
+with the files changed on disk since the last one (see IzVerifier.refresh).
+
+Usage:
+
+    python -m IzVerifier.daemon --socket /tmp/izverifier.sock --specs-path izpack/ \\
+                                --resources-path resources/ [--pom pom.xml] [--sources src/ ...]
+"""
+import argparse
+import json
+import os
+import socket
+import SocketServer
+import threading
+
+from IzVerifier.exceptions.IzVerifierException import IzVerifierException
+from IzVerifier.izverifier import IzVerifier
+
+__author__ = 'fcanas'
+
+
+class VerifierDaemon():
+    """
+    Serves requests to a single long-lived IzVerifier over a Unix domain socket.
+
+    Each client connection is handled in its own thread, and may send any number of requests.
+    Requests are run one at a time against the verifier, since its caches aren't thread-safe.
+    """
+
+    methods = ['verify', 'verify_all', 'dependency_verification', 'find_references', 'find_references_many',
+               'impact', 'refresh', 'ping']
+
+    def __init__(self, args, socket_path):
+        """
+        Args are the IzVerifier args; unless an index is given, an in-memory one is used.
+        Socket_path is the path of the Unix domain socket to listen on.
+        """
+        args = dict(args)
+        args.setdefault('index', True)
+        self.verifier = IzVerifier(args)
+        self.verifier.refresh()
+        self.socket_path = socket_path
+        self.lock = threading.Lock()
+        self.server = None
+
+    def handle(self, line):
+        """
+        Runs the request in the given line of JSON, and returns the response as a dict.
+        """
+        try:
+            request = _strings(json.loads(line))
+            method = request.get('method')
+            params = request.get('params') or {}
+            if not method in self.methods:
+                raise IzVerifierException('Unknown method: ' + str(method))
+            if not isinstance(params, dict):
+                raise IzVerifierException('Params must be an object')
+            with self.lock:
+                if method == 'ping':
+                    return {'result': 'pong'}
+                changed = self.verifier.refresh()
+                if method == 'refresh':
+                    return {'result': _jsonable(changed)}
+                return {'result': _jsonable(getattr(self.verifier, method)(**params))}
+        except IzVerifierException as e:
+            return {'error': str(e.value)}
+        except Exception as e:
+            return {'error': '{0}: {1}'.format(type(e).__name__, e)}
+
+    def start(self):
+        """
+        Starts listening on the socket, replacing any socket file left there by an earlier daemon.
+        """
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        self.server = DaemonServer(self.socket_path, RequestHandler)
+        self.server.verifier_daemon = self
+
+    def serve_forever(self):
+        """
+        Serves requests until shutdown() is called.
+        """
+        if self.server is None:
+            self.start()
+        try:
+            self.server.serve_forever()
+        finally:
+            self.server.server_close()
+            if os.path.exists(self.socket_path):
+                os.remove(self.socket_path)
+
+    def shutdown(self):
+        """
+        Stops serving requests. Must be called from another thread than serve_forever's.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+
+
+class DaemonServer(SocketServer.ThreadingMixIn, SocketServer.UnixStreamServer):
+    daemon_threads = True
+
+
+class RequestHandler(SocketServer.StreamRequestHandler):
+    """
+    Answers each line of JSON read from a client connection with a line of JSON.
+    """
+
+    def handle(self):
+        for line in iter(self.rfile.readline, ''):
+            if not line.strip():
+                continue
+            response = self.server.verifier_daemon.handle(line)
+            self.wfile.write(json.dumps(response) + '\n')
+            self.wfile.flush()
+
+
+def request(socket_path, method, **params):
+    """
+    Sends a single request to the daemon listening on socket_path, and returns its result.
+    Raises an IzVerifierException with the daemon's message if the request failed.
+    """
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(socket_path)
+        stream = client.makefile('rwb')
+        stream.write(json.dumps({'method': method, 'params': params}) + '\n')
+        stream.flush()
+        response = json.loads(stream.readline())
+        stream.close()
+    finally:
+        client.close()
+    if 'error' in response:
+        raise IzVerifierException(response['error'])
+    return response['result']
+
+
+def _jsonable(value):
+    """
+    Returns value with its sets, FailurePaths and tuples converted to lists, sets sorted.
+    """
+    if isinstance(value, dict):
+        return dict((str(key), _jsonable(item)) for key, item in value.items())
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(item) for item in value]
+    if isinstance(value, basestring) or value is None or isinstance(value, (bool, int, long, float)):
+        return value
+    return sorted(_jsonable(item) for item in value)
+
+
+def _strings(value):
+    """
+    Returns value decoded from JSON with its unicode strings encoded to utf-8 str, as the verifier expects.
+    """
+    if isinstance(value, dict):
+        return dict((_strings(key), _strings(item)) for key, item in value.items())
+    if isinstance(value, list):
+        return [_strings(item) for item in value]
+    if isinstance(value, unicode):
+        return value.encode('utf-8')
+    return value
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Serves IzVerifier requests over a Unix domain socket.')
+    parser.add_argument('--socket', required=True, help='path of the Unix domain socket to listen on')
+    parser.add_argument('--specs-path', dest='specs_path', required=True)
+    parser.add_argument('--resources-path', dest='resources_path', required=True)
+    parser.add_argument('--pom')
+    parser.add_argument('--sources', nargs='*', default=[])
+    parser.add_argument('--scanner')
+    parser.add_argument('--parser')
+    parser.add_argument('--index')
+    parser.add_argument('--workers', type=int)
+    parser.add_argument('--max-hits', dest='max_hits', type=int)
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_arguments(argv)
+    args = dict((key, value) for key, value in vars(options).items() if value is not None and key != 'socket')
+    VerifierDaemon(args, options.socket).serve_forever()
+
+
+if __name__ == '__main__':
+    main()
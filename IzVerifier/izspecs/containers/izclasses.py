@@ -31,10 +31,10 @@ class IzClasses(IzContainer):
         WHITE_LIST_PATTERNS: ['^com.izforge.izpack.*$']
     }
 
-    def __init__(self, path=None):
+    def __init__(self, path=None, documents=None):
         """
         Initializes the container from the path to the root of custom source code.
-        Note: does not make use of parent class __init__.
+        Note: does not make use of parent class __init__, and has no xml documents to parse.
         """
         self.container = {}
         self.referenced = {}
@@ -1,6 +1,6 @@
 import re
 
-from IzVerifier.izspecs.containers.izcontainer import IzContainer
+from IzVerifier.izspecs.containers.izcontainer import IzContainer, SpecRecord, source_line
 from IzVerifier.izspecs.containers.constants import *
 
 
@@ -29,11 +29,34 @@ class IzConditions(IzContainer):
                    ("getCondition\({0}", "getCondition\(({0})\)")]
     }
 
+    # Child element holding the main value of each type of condition.
+    value_elements = {
+        'variable': 'name',
+        'exists': 'variable',
+        'java': 'class'
+    }
+
     def parse(self, soup):
         """ Extracts all conditions from conditions.xml document. """
         conds = soup.find_all(self.has_condition_definition)
         for cond in conds:
-            self.container[str(cond['id'])] = cond
+            cid = str(cond['id'])
+            refs = tuple(str(dep['refid']) for dep in cond.find_all('condition') if dep.has_attr('refid'))
+            self.container[cid] = SpecRecord(cid, self.definition_value(cond), cond.get('type'), refs,
+                                             source_line(cond))
+
+    def definition_value(self, element):
+        """
+        Returns the text of the child element holding a condition's main value: the variable
+        of 'variable' and 'exists' conditions, or the class of 'java' conditions.
+        Returns None if the condition has no such child.
+        """
+        name = self.value_elements.get(element.get('type'))
+        if name:
+            child = element.find(name)
+            if child is not None:
+                return child.get_text()
+        return None
 
     def get_keys(self):
         """
@@ -47,12 +70,11 @@ class IzConditions(IzContainer):
         """
         variables = set()
         for cond in self.container.itervalues():
-            if self.has_def_by_variable_ref(cond):
-                if cond.find('name'):
-                    var = cond.find('name').get_text()
-                    variables.add((var, cond['id']))
+            if cond.type == 'variable':
+                if cond.value:
+                    variables.add((cond.value, cond.id))
                 else:
-                    variables.add(("no_var_defined", cond['id']))
+                    variables.add(("no_var_defined", cond.id))
         return variables
 
     def print_keys(self):
@@ -64,7 +86,7 @@ class IzConditions(IzContainer):
 
     def get_spec_elements(self):
         """
-        Returns a set of xml elements defining each condition.
+        Returns a set of records defining each condition.
         """
         return set(self.container.values())
 
@@ -127,23 +149,23 @@ class IzConditions(IzContainer):
     @staticmethod
     def get_identifier(element):
         """
-        Returns the identifying value for this element.
+        Returns the identifying value for this record.
         """
-        return element['id']
+        return element.id
 
     @staticmethod
     def get_value(element):
         """
-        Returns the main 'value' for this element.
-        In the case of conditions, its value is the entire definition, or element.
+        Returns the main 'value' for this record.
+        In the case of conditions, its value is the entire definition, or record.
         """
         return element
 
     @staticmethod
     def element_sort_key(element):
         """
-        Returns the key to use when sorting elements of this container.
+        Returns the key to use when sorting records of this container.
         """
-        return element['id'].lower()
+        return element.id.lower()
 
 
@@ -1,6 +1,6 @@
-from bs4 import BeautifulSoup
 from abc import abstractmethod
 from IzVerifier.exceptions.IzVerifierException import MissingFileException
+from IzVerifier.izspecs.izdocuments import IzDocuments
 
 
 class IzContainer():
@@ -11,16 +11,30 @@ class IzContainer():
     izconditions (for izpack conditions)
     izstrings (for izpack localized strings)
     izvariables (for izpack variables)
+
+    Definitions are stored as compact SpecRecords rather than xml elements, so nothing of the
+    parsed document is kept alive by the container once parsing is done.
     """
 
-    def __init__(self, path):
+    # Whether the definition spec stays in the documents cache after parsing, for later searches.
+    keep_document = True
+
+    def __init__(self, path, documents=None):
+        """
+        Parses the container's definition spec at path. Documents is the IzDocuments cache to parse it through.
+        """
         self.container = {}
         self.referenced = {}
+        if not documents:
+            documents = IzDocuments()
+        self.documents = documents
         try:
-            self.soup = BeautifulSoup(open(path), 'xml')
+            soup = self.documents.get(path)
         except IOError:
             raise MissingFileException("spec not found at: " + path)
-        self.parse(self.soup)
+        self.parse(soup)
+        if not self.keep_document:
+            self.documents.release(path)
 
     def get_referenced(self):
         """
@@ -82,3 +96,37 @@ class IzContainer():
         Returns the key to use when sorting elements for this container.
         """
         pass
+
+
+class SpecRecord(object):
+    """
+    Compact record of a single spec definition:
+
+    id      : the definition's identifier.
+    value   : its main value, ie. a variable's value or a string's text.
+    type    : its type, for definitions that have one (conditions).
+    refs    : a tuple of the ids of other definitions it refers to (a compound condition's children).
+    line    : the line it was defined on in its spec file, when the parser provides it.
+    """
+    __slots__ = ('id', 'value', 'type', 'refs', 'line')
+
+    def __init__(self, id, value=None, type=None, refs=(), line=None):
+        self.id = id
+        self.value = value
+        self.type = type
+        self.refs = refs
+        self.line = line
+
+    def __repr__(self):
+        return 'SpecRecord({0!r}, {1!r}, {2!r}, {3!r}, {4!r})'.format(self.id, self.value, self.type, self.refs,
+                                                                       self.line)
+
+
+def source_line(element):
+    """
+    Returns the line an element was found on, if its parser recorded it.
+    """
+    line = getattr(element, 'sourceline', None)
+    if isinstance(line, int):
+        return line
+    return None
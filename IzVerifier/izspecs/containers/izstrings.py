@@ -1,6 +1,4 @@
-from bs4 import BeautifulSoup
-
-from IzVerifier.izspecs.containers.izcontainer import IzContainer
+from IzVerifier.izspecs.containers.izcontainer import IzContainer, SpecRecord, source_line
 from IzVerifier.izspecs.containers.constants import *
 
 
@@ -37,12 +35,15 @@ class IzStrings(IzContainer):
         PARENT_CLOSING_TAG: '</langpack>',
     }
 
+    # Langpacks are only ever read for their definitions.
+    keep_document = False
+
     def parse_izpack_strings(self, path):
         """
         Parse izpack's built-in langpack strings.
         """
-        self.soup_izpack = BeautifulSoup(open(path), 'xml')
-        self.parse(self.soup_izpack)
+        self.parse(self.documents.get(path))
+        self.documents.release(path)
 
     def parse(self, soup):
         """
@@ -50,7 +51,8 @@ class IzStrings(IzContainer):
         """
         strings = soup.find_all(self.has_definition)
         for st in strings:
-            self.container[str(st['id'])] = st
+            sid = str(st['id'])
+            self.container[sid] = SpecRecord(sid, st['txt'], line=source_line(st))
 
     def has_definition(self, element):
         """
@@ -118,7 +120,7 @@ class IzStrings(IzContainer):
 
     def get_spec_elements(self):
         """
-        Returns a set of xml elements defining each condition.
+        Returns a set of records defining each string.
         """
         return set(self.container.values())
 
@@ -129,9 +131,24 @@ class IzStrings(IzContainer):
         """
         return reference
 
+    @staticmethod
+    def get_identifier(element):
+        """
+        Returns the identifying value for this record.
+        """
+        return element.id
+
+    @staticmethod
+    def get_value(element):
+        """
+        Returns the main 'value' for this record.
+        In the case of strings, its value is its text.
+        """
+        return element.value
+
     @staticmethod
     def element_sort_key(element):
         """
-        Returns the key to use when sorting elements of this container.
+        Returns the key to use when sorting records of this container.
         """
-        return element['id'].lower()
+        return element.id.lower()
@@ -1,4 +1,4 @@
-from IzVerifier.izspecs.containers.izcontainer import IzContainer
+from IzVerifier.izspecs.containers.izcontainer import IzContainer, SpecRecord, source_line
 from IzVerifier.izspecs.containers.constants import *
 
 
@@ -38,7 +38,8 @@ class IzVariables(IzContainer):
         """
         variables = soup.find_all('variable')
         for var in variables:
-            self.container[str(var['name'])] = var
+            name = str(var['name'])
+            self.container[name] = SpecRecord(name, var.get('value'), line=source_line(var))
 
     def get_keys(self):
         """
@@ -54,7 +55,7 @@ class IzVariables(IzContainer):
 
     def get_spec_elements(self):
         """
-        Returns a set of xml elements defining each variable.
+        Returns a set of records defining each variable.
         """
         return set(self.container.values())
 
@@ -81,24 +82,24 @@ class IzVariables(IzContainer):
     @staticmethod
     def element_sort_key(element):
         """
-        Returns the key to use when sorting elements of this container.
+        Returns the key to use when sorting records of this container.
         """
-        return element['name'].lower()
+        return element.id.lower()
 
     @staticmethod
     def get_identifier(element):
         """
-        Returns the identifying value for this element.
+        Returns the identifying value for this record.
         """
-        return element['name']
+        return element.id
 
     @staticmethod
     def get_value(element):
         """
-        Returns the main 'value' for this element.
+        Returns the main 'value' for this record.
         In the case of variables, its value is its value.
         """
-        return element['value']
+        return element.value
 
     @staticmethod
     def ref_transformer(ref):
@@ -0,0 +1,274 @@
+import os
+from IzVerifier.exceptions.IzVerifierException import IzArgumentsException
+from IzVerifier.logging.instrumentation import NULL_INSTRUMENTATION
+
+__author__ = 'fcanas'
+
+
+class IzDocuments():
+    """
+    Cache of parsed xml documents, shared by IzPaths, the containers and the Seeker so that
+    each spec file is parsed only once per run.
+
+    Documents are keyed by path and parser features, and are parsed again if the file's
+    modification time changes.
+
+    The parser used for xml documents is either 'soup' (BeautifulSoup, the default) or 'iterparse'.
+    The iterparse parser never builds a full tree: each search streams the file through lxml's
+    iterparse and keeps only lightweight views of the elements that pass its filter.
+    """
+
+    parsers = ['soup', 'iterparse']
+
+    def __init__(self, parser='soup', instrument=NULL_INSTRUMENTATION):
+        if not parser in self.parsers:
+            raise IzArgumentsException("Unknown xml parser: " + str(parser))
+        self.parser = parser
+        self.instrument = instrument
+        self.documents = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, path, features='xml'):
+        """
+        Returns the soup for the xml document at the given path, parsing it only if it
+        is not already cached. Raises IOError if the file can't be opened.
+
+        With the iterparse parser, xml documents are returned as StreamedDocuments instead.
+        """
+        key = (os.path.realpath(path), features)
+
+        with open(path) as f:
+            mtime = os.fstat(f.fileno()).st_mtime
+            if key in self.documents and self.documents[key][0] == mtime:
+                self.hits += 1
+                self.instrument.count('document cache hits')
+                return self.documents[key][1]
+
+            self.misses += 1
+            if features == 'xml' and self.parser == 'iterparse':
+                soup = StreamedDocument(path, self.instrument)
+            else:
+                # Deferred until a document is parsed, as bs4 takes most of the package's import time.
+                from bs4 import BeautifulSoup
+                with self.instrument.phase('xml parsing'), self.instrument.span('parse', path=path):
+                    soup = BeautifulSoup(f, features)
+                self.instrument.count('xml documents parsed')
+
+        self.documents[key] = (mtime, soup)
+        return soup
+
+    def release(self, path, features='xml'):
+        """
+        Drops a single document from the cache.
+        """
+        self.documents.pop((os.path.realpath(path), features), None)
+
+    def clear(self):
+        """
+        Drops all cached documents.
+        """
+        self.documents = {}
+
+    def stats(self):
+        """
+        Returns the cache's hit and miss counters in the form:
+        {
+            'hits': count,
+            'misses': count
+        }
+        """
+        return {'hits': self.hits, 'misses': self.misses}
+
+
+class StreamedDocument():
+    """
+    An xml document that is streamed through lxml's iterparse on every search instead of being
+    held in memory. Supports the find_all searches the containers and the Seeker make on soups.
+    """
+
+    def __init__(self, path, instrument=NULL_INSTRUMENTATION):
+        self.path = path
+        self.instrument = instrument
+
+    def find_all(self, name=True):
+        """
+        Returns a list of ElementViews for all elements in the document that pass the filter.
+        The filter is either an element name, a function taking an ElementView, or True for all elements.
+
+        Elements are cleared as soon as each top-level subtree has been searched, so only the
+        largest top-level subtree and the matching views are ever held in memory.
+        """
+        with self.instrument.phase('xml parsing'), self.instrument.span('parse', path=self.path):
+            hits = self.stream(name)
+        self.instrument.count('xml documents parsed')
+        return hits
+
+    def stream(self, name):
+        """
+        Streams the document through iterparse for find_all.
+        """
+        if callable(name):
+            filter_fn = name
+        elif name is True:
+            filter_fn = lambda element: True
+        else:
+            filter_fn = lambda element: element.name == name
+
+        hits = []
+        stack = []
+        document = ElementView('[document]', {})
+
+        from lxml import etree
+        events = etree.iterparse(self.path, events=('start', 'end'), remove_comments=True, recover=True)
+        for event, element in iter_events(events):
+            if event == 'start':
+                if stack:
+                    parent = stack[-1][2]
+                else:
+                    parent = document
+                view = ElementView(local_name(element.tag),
+                                   element_attributes(element),
+                                   parent,
+                                   sourceline=element.sourceline)
+                stack.append((view, [], ElementView(view.name, view.attrs)))
+                continue
+
+            view, children = stack.pop()[:2]
+            view.children = children
+            view.own_text = element.text
+            view.tail = element.tail
+
+            if filter_fn(view):
+                hits.append(view)
+
+            if len(stack) > 1:
+                stack[-1][1].append(view)
+            elif len(stack) == 1:
+                # End of a top-level subtree: release it.
+                element.clear()
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+        return hits
+
+
+class ElementView(object):
+    """
+    Lightweight, detached view of an xml element, offering the parts of BeautifulSoup's
+    Tag interface used by the containers' filters and the dependency verifier.
+    """
+    __slots__ = ('name', 'attrs', 'parent', 'children', 'own_text', 'tail', 'sourceline')
+
+    def __init__(self, name, attrs, parent=None, children=(), own_text=None, tail=None, sourceline=None):
+        self.name = name
+        self.attrs = attrs
+        self.parent = parent
+        self.children = children
+        self.own_text = own_text
+        self.tail = tail
+        self.sourceline = sourceline
+
+    def has_attr(self, key):
+        return key in self.attrs
+
+    def get(self, key, default=None):
+        return self.attrs.get(key, default)
+
+    def __getitem__(self, key):
+        return self.attrs[key]
+
+    def __len__(self):
+        """
+        Number of child elements and text nodes, as a Tag's contents.
+        """
+        length = len(self.children)
+        if self.own_text:
+            length += 1
+        for child in self.children:
+            if child.tail:
+                length += 1
+        return length
+
+    def __repr__(self):
+        return '<{0} {1}>'.format(self.name, self.attrs)
+
+    def get_text(self):
+        """
+        Returns all of the text held in this element and its descendants.
+        """
+        text = [self.own_text or '']
+        for child in self.children:
+            text.append(child.get_text())
+            text.append(child.tail or '')
+        return ''.join(text)
+
+    @property
+    def text(self):
+        return self.get_text()
+
+    def descendants(self):
+        """
+        Yields all descendant elements in document order.
+        """
+        for child in self.children:
+            yield child
+            for descendant in child.descendants():
+                yield descendant
+
+    def find_all(self, name=True):
+        """
+        Returns all descendant elements with the given name, or all of them if name is True.
+        """
+        return [element for element in self.descendants() if name is True or element.name == name]
+
+    def find(self, name):
+        """
+        Returns the first descendant element with the given name, or None.
+        """
+        for element in self.descendants():
+            if element.name == name:
+                return element
+        return None
+
+
+def iter_events(events):
+    """
+    Yields iterparse events, stopping at the first error that can't be recovered from (as in
+    an empty file), where BeautifulSoup would return whatever it managed to parse.
+    """
+    from lxml import etree
+    try:
+        for event in events:
+            yield event
+    except etree.XMLSyntaxError:
+        return
+
+
+def local_name(tag):
+    """
+    Strips the namespace from an lxml tag.
+    """
+    if tag[0] == '{':
+        return tag.split('}', 1)[1]
+    return tag
+
+
+def element_attributes(element):
+    """
+    Returns an lxml element's attributes, with namespaced attributes named 'prefix:name' as in BeautifulSoup.
+    """
+    attrs = {}
+    prefixes = None
+    for key, value in element.attrib.items():
+        if key[0] == '{':
+            if prefixes is None:
+                prefixes = dict((uri, prefix) for prefix, uri in element.nsmap.items())
+            uri, name = key[1:].split('}', 1)
+            prefix = prefixes.get(uri)
+            if prefix:
+                key = prefix + ':' + name
+            else:
+                key = name
+        attrs[key] = value
+    return attrs
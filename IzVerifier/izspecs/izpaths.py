@@ -1,8 +1,8 @@
 import os
 from os.path import dirname
-from bs4 import BeautifulSoup
 import re
 from IzVerifier.exceptions.IzVerifierException import MissingFileException
+from IzVerifier.izspecs.izdocuments import IzDocuments
 
 __author__ = 'fcanas'
 
@@ -12,12 +12,15 @@ class IzPaths():
     Class responsible for providing paths to specific IzPack resources and spec files.
     """
     
-    def __init__(self, specs, resources, properties=None):
+    def __init__(self, specs, resources, properties=None, documents=None):
         """
         Initialize the installer's root path.
         """
         if not properties:
             properties = {}
+        if not documents:
+            documents = IzDocuments()
+        self.documents = documents
         self.init_collections()
         self.properties = properties
         self.set_paths(specs, resources)
@@ -68,7 +71,7 @@ class IzPaths():
         Extracts paths to available izpack resources and spec files from the
         installer's install.xml spec.
         """
-        self.soup = BeautifulSoup(open(self.get_path('install')))
+        self.soup = self.documents.get(self.get_path('install'), None)
         for spec in self.specs.keys():
             spec_file = self.find_specs_path(spec)
             if spec_file:
@@ -113,7 +116,7 @@ class IzPaths():
         if not path:
             rsoup = self.soup
         else:
-            rsoup = BeautifulSoup(open(path))
+            rsoup = self.documents.get(path, None)
 
         self.parse_resources(rsoup)
 
@@ -1,4 +1,3 @@
-from bs4 import BeautifulSoup
 import re
 
 __author__ = 'fcanas'
@@ -23,6 +22,7 @@ class IzProperties(dict):
         """
         Finds properties defined in properties file at specified path adds them to map.
         """
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(open(path, 'r'))
         properties = soup.find_all('properties')
 
@@ -37,6 +37,7 @@ class IzProperties(dict):
         """
         Special parser for pom.xml file properties.
         """
+        from bs4 import BeautifulSoup
         soup = BeautifulSoup(open(path, 'r'), 'xml')
         properties = soup.find_all('properties')
 
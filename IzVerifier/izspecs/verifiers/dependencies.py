@@ -1,3 +1,5 @@
+import time
+
 from IzVerifier.izspecs.containers.constants import *
 
 __author__ = 'fcanas'
@@ -17,6 +19,10 @@ class ConditionDependencyGraph():
         self.drefs = self.conditions.get_keys()
         self.fail_on_undefined_vars = fail_on_undefined_vars
         self.filter_classes = filter_claases
+        self.instrument = verifier.instrumentation
+        self.graph = ConditionGraph(self.conditions, self.compound_conditions)
+        self.leaves = {}
+        self.failures = {}
 
     def all_references(self):
         srefs, specs = self.unzip(self.srefs)
@@ -38,6 +44,8 @@ class ConditionDependencyGraph():
 
             if result:
                 self.ill_defined[condition] = result
+                # Memoized failures may pass through the newly ill-defined condition.
+                self.failures = {}
             else:
                 self.well_defined.add(condition)
 
@@ -59,56 +67,146 @@ class ConditionDependencyGraph():
         """
         Performs a depth-first search of a condition's dependencies in order
         to verify that all dependencies and transitive dependencies are defined
-        and valid.
+        and valid. Returns the paths to undefined dependencies as FailurePaths.
         """
-        undefined_paths = set()
-        self._verify_dependencies(cond_id, undefined_paths, tuple())
-        return undefined_paths
+        result, failure = self.search(cond_id)
+        return FailurePaths([failure] if failure is not None else [])
 
     def _verify_dependencies(self, cond_id, undefined_paths, current_path):
         """
-        Given the soup for a condition, test that its dependencies are validly
-        defined.
+        Given the id of a condition and the path taken to it, test that its dependencies are validly
+        defined, adding the paths to undefined dependencies to undefined_paths.
         """
+        result, failure = self.search(cond_id)
+        if failure is not None:
+            undefined_paths.update(current_path + path for path in FailurePaths([failure]))
+        return result
 
-        # Exception for izpack conditions:
-        if cond_id in self.conditions.properties[WHITE_LIST]:
-            return True
-
-        # Short-circuit on well-defined conditions:
-        if cond_id in self.well_defined:
-            return True
-
-        # Short-circuit ill-defined conditions:
-        if cond_id in self.ill_defined.keys():
-            current_path = current_path + ((cond_id, 'ill-defined condition'),)
-            undefined_paths.add(current_path)
-            return False
-
-        # Cycle checking:
-        tup = (cond_id, 'condition')
-        if tup in current_path:
-            current_path += ((cond_id, 'cyclic condition reference'),)
-            undefined_paths.add(current_path)
-            return False
-
-        # Check for undefined condition.
-        if not cond_id in self.conditions.get_keys():
-            tup = (cond_id, 'undefined condition')
-            current_path += (tup,)
-            undefined_paths.add(current_path)
-            return False
+    def search(self, cond_id):
+        """
+        Tests that the dependencies of the given condition are validly defined. Returns the result and
+        the FailureNode the paths to its undefined dependencies start with, or None if there are none.
+
+        The compiled graph is searched depth-first with an explicit stack of frames, one per compound
+        condition being searched: [node, failure node, next child, result, start time].
+        Cycles are found beforehand as strongly connected components: a condition on a cycle fails with
+        a path to the cycle, and only its references to conditions off the cycle are searched. So the
+        paths found from a condition on never depend on the path taken to it, and the failure node of
+        each condition is memoized and shared by all the paths through it.
+        """
+        graph = self.graph
+        ids = graph.ids
+        successors = graph.successors
+        cycles = graph.cycle_labels()
+        stack = []
+        instrument = self.instrument
+        tracing = instrument.trace is not None
+
+        def enter(node):
+            """
+            Visits a node. Returns its result and failure node, or None if a frame was pushed for it.
+            """
+            instrument.count('condition visits')
+            cid = ids[node]
+
+            # Exception for izpack conditions:
+            if graph.white_listed[node]:
+                return True, None
+
+            # Short-circuit on well-defined conditions:
+            if cid in self.well_defined:
+                return True, None
+
+            # Short-circuit ill-defined conditions:
+            if cid in self.ill_defined:
+                return False, FailureNode((cid, 'ill-defined condition'))
+
+            # Check for undefined condition.
+            condition = graph.records[node]
+            if condition is None:
+                return False, FailureNode((cid, 'undefined condition'))
+
+            # Reuse memoized failures.
+            if node in self.failures:
+                return False, self.failures[node]
+
+            if condition.type in self.compound_conditions:
+                failure = FailureNode((cid, 'condition'))
+                frame = [node, failure, 0, True, None]
+                # Cycle checking:
+                if node in cycles:
+                    failure.add(FailureNode((cycles[node], 'condition cycle')))
+                    frame[3] = False
+                stack.append(frame)
+                return None
+
+            result, failure = self.leaf_outcome(node)
+            if result:
+                self.well_defined.add(cid)
+            return result, failure
+
+        def visit(node):
+            if not tracing:
+                return enter(node)
+            start = time.time()
+            outcome = enter(node)
+            if outcome is None:
+                stack[-1][4] = start
+            else:
+                instrument.record_span('condition', start, id=ids[node])
+            return outcome
+
+        outcome = visit(graph.node(cond_id))
+        while stack:
+            frame = stack[-1]
+            node = frame[0]
+            refs = successors[node]
+            if frame[2] < len(refs):
+                child = refs[frame[2]]
+                frame[2] += 1
+                outcome = visit(child)
+                if outcome is not None and not outcome[0]:
+                    frame[3] = False
+                    if outcome[1] is not None:
+                        frame[1].add(outcome[1])
+                continue
+
+            stack.pop()
+            result = frame[3]
+            # A failure with no paths, like that of a condition depending on a java condition, has no node.
+            failure = frame[1] if frame[1].children else None
+            if result:
+                self.well_defined.add(ids[node])
+            else:
+                self.failures[node] = failure
 
-        current_path += (tup,)
-        condition = self.conditions.container[cond_id]
-        condition_type = condition['type']
+            if stack:
+                if not result:
+                    stack[-1][3] = False
+                    if failure is not None:
+                        stack[-1][1].add(failure)
+            else:
+                outcome = result, failure
+            if tracing:
+                instrument.record_span('condition', frame[4], id=ids[node])
 
-        if condition_type in self.condition_tests.keys() and not \
-                self.condition_tests[condition_type](self, condition, undefined_paths, current_path):
-            return False
+        return outcome
 
-        self.well_defined.add(cond_id)
-        return True
+    def leaf_outcome(self, node):
+        """
+        Returns the result of testing a condition that has no children, and the failure node the paths
+        to its undefined dependencies start with, or None. Leaf tests only depend on the condition, so
+        each is run once.
+        """
+        if not node in self.leaves:
+            condition = self.graph.records[node]
+            paths = set()
+            result = True
+            if condition.type in self.condition_tests.keys() and not \
+                    self.condition_tests[condition.type](self, condition, paths, ((condition.id, 'condition'),)):
+                result = False
+            self.leaves[node] = (result, FailurePaths.from_paths(paths).root())
+        return self.leaves[node]
 
     def test_variable(self, condition, undefined_paths, current_path):
         """
@@ -118,7 +216,7 @@ class ConditionDependencyGraph():
         :param current_path: the current path.
         :return: True for a well-defined condition, False otherwise.
         """
-        var = str(condition.find('name').text)
+        var = str(condition.value or '')
         if not var in self.variables.get_keys() and self.fail_on_undefined_vars:
             current_path += ((var, 'undefined variable'),)
             undefined_paths.add(current_path)
@@ -134,7 +232,7 @@ class ConditionDependencyGraph():
         :param current_path: the current path.
         :return: True for a well-defined condition, False otherwise.
         """
-        var = str(condition.find('variable').text)
+        var = str(condition.value or '')
         if not var in self.variables.get_keys() and self.fail_on_undefined_vars:
             current_path += ((var, 'undefined variable'),)
             undefined_paths.add(current_path)
@@ -160,15 +258,14 @@ class ConditionDependencyGraph():
         :param current_path: the current path.
         :return: True for a well-defined condition, False otherwise.
         """
-        cond_id = str(condition.get('id'))
+        cond_id = condition.id
 
-        try:
-            cid = str(condition.find('class').text)
-        except AttributeError:
+        if condition.value is None:
             current_path += ((cond_id, 'ill-defined java condition'),)
             undefined_paths.add(current_path)
             return False
 
+        cid = str(condition.value)
         if not cid:
             current_path += ((cid, 'ill-defined java condition'),)
             undefined_paths.add(current_path)
@@ -189,9 +286,7 @@ class ConditionDependencyGraph():
         :return: True for a well-defined condition, False otherwise.
         """
         defined_children = True
-        dependencies = condition.find_all('condition')
-        for dep in dependencies:
-            did = str(dep['refid'])
+        for did in condition.refs:
             if not self._verify_dependencies(did, undefined_paths, current_path):
                 defined_children = False
         return defined_children
@@ -218,5 +313,245 @@ class ConditionDependencyGraph():
             return x, list()
 
 
+class ConditionGraph():
+    """
+    The conditions of an installer compiled into an integer-indexed adjacency structure. Each condition
+    id, defined or only referenced, is a node; a compound condition's children are the nodes it refers to,
+    and its successors the children that aren't on a cycle with it.
+    """
+
+    def __init__(self, conditions, compound_conditions):
+        self.container = conditions.container
+        self.white_list = set(conditions.properties[WHITE_LIST])
+        self.compound_conditions = compound_conditions
+        self.ids = []
+        self.index = {}
+        self.records = []
+        self.children = []
+        self.successors = []
+        self.white_listed = []
+        self.sccs = None
+        self.component_count = 0
+        self.labels = None
+
+        for cid in self.container:
+            self.node(cid)
+        for node in range(len(self.ids)):
+            condition = self.records[node]
+            if condition is not None and not self.white_listed[node] and condition.type in compound_conditions:
+                self.children[node] = tuple(self.node(ref) for ref in condition.refs)
+
+        # References to conditions off each condition's own cycle.
+        components = self.components()
+        self.successors = [tuple(child for child in children if components[child] != components[node])
+                           for node, children in enumerate(self.children)]
+
+    def node(self, cid):
+        """
+        Returns the node of the condition with the given id, adding one for ids that aren't known yet.
+        """
+        if not cid in self.index:
+            self.index[cid] = len(self.ids)
+            self.ids.append(cid)
+            self.records.append(self.container.get(cid))
+            self.children.append(())
+            self.successors.append(())
+            self.white_listed.append(cid in self.white_list)
+            if self.sccs is not None:
+                # A node added after the components were found has no children, so is a component of its own.
+                self.sccs.append(self.component_count)
+                self.component_count += 1
+        return self.index[cid]
+
+    def components(self):
+        """
+        Returns a list mapping each node to the strongly connected component it belongs to, found
+        with an iterative version of Tarjan's algorithm. Nodes share a component if each can be
+        reached from the other, ie. if they are on a common cycle.
+        """
+        if self.sccs is None:
+            count = len(self.ids)
+            order = [None] * count
+            low = [0] * count
+            on_stack = [False] * count
+            sccs = [None] * count
+            stack = []
+            counter = 0
+            component = 0
+
+            for root in range(count):
+                if order[root] is not None:
+                    continue
+                work = [(root, 0)]
+                while work:
+                    node, child = work.pop()
+                    refs = self.children[node]
+                    if child == 0:
+                        order[node] = low[node] = counter
+                        counter += 1
+                        stack.append(node)
+                        on_stack[node] = True
+                    else:
+                        # Returning from the search of the previous child.
+                        low[node] = min(low[node], low[refs[child - 1]])
+
+                    descended = False
+                    while child < len(refs):
+                        ref = refs[child]
+                        child += 1
+                        if order[ref] is None:
+                            work.append((node, child))
+                            work.append((ref, 0))
+                            descended = True
+                            break
+                        elif on_stack[ref]:
+                            low[node] = min(low[node], order[ref])
+                    if descended:
+                        continue
+
+                    if low[node] == order[node]:
+                        while True:
+                            member = stack.pop()
+                            on_stack[member] = False
+                            sccs[member] = component
+                            if member == node:
+                                break
+                        component += 1
+            self.sccs = sccs
+            self.component_count = component
+        return self.sccs
+
+    def cycles(self):
+        """
+        Returns the cycles of conditions, as a sorted list of tuples of the sorted ids of each strongly
+        connected component on a cycle: one of several conditions, or of a condition referring to itself.
+        """
+        components = self.components()
+        members = {}
+        for node, component in enumerate(components):
+            members.setdefault(component, []).append(node)
+
+        cycles = []
+        for nodes in members.values():
+            if len(nodes) > 1 or nodes[0] in self.children[nodes[0]]:
+                cycles.append(tuple(sorted(self.ids[node] for node in nodes)))
+        return sorted(cycles)
+
+    def cycle_labels(self):
+        """
+        Returns a dict mapping each node on a cycle to a label for its cycle, the ids of its conditions.
+        """
+        if self.labels is None:
+            self.labels = {}
+            for cycle in self.cycles():
+                for cid in cycle:
+                    self.labels[self.index[cid]] = ', '.join(cycle)
+        return self.labels
+
+
+class FailureNode(object):
+    """
+    A step of the paths to undefined dependencies: an (id, type) element, and the steps that follow
+    it, by element. Nodes are shared by all the paths through them, so common prefixes and the paths
+    found from a shared condition on are stored once.
+    """
+    __slots__ = ('element', 'children')
+
+    def __init__(self, element):
+        self.element = element
+        self.children = {}
+
+    def add(self, child):
+        """
+        Adds a following step. Steps with equal elements lead to the same paths, so are kept once.
+        """
+        if not child.element in self.children:
+            self.children[child.element] = child
+
+
+class FailurePaths(object):
+    """
+    A set of paths to undefined dependencies, stored as a graph of FailureNodes. Behaves like a
+    read-only set of the paths, as tuples of (id, type) elements, without building them all.
+    """
 
+    def __init__(self, roots=()):
+        self.roots = list(roots)
 
+    @staticmethod
+    def from_paths(paths):
+        """
+        Returns the FailurePaths holding the given path tuples.
+        """
+        roots = {}
+        for path in paths:
+            if not path[0] in roots:
+                roots[path[0]] = FailureNode(path[0])
+            node = roots[path[0]]
+            for element in path[1:]:
+                if not element in node.children:
+                    node.children[element] = FailureNode(element)
+                node = node.children[element]
+        return FailurePaths(roots.values())
+
+    def root(self):
+        """
+        Returns the single node all the paths start with, or None if there are no paths.
+        """
+        if self.roots:
+            return self.roots[0]
+        return None
+
+    def __iter__(self):
+        stack = [(node, (node.element,)) for node in self.roots]
+        while stack:
+            node, path = stack.pop()
+            if not node.children:
+                yield path
+            for child in node.children.values():
+                stack.append((child, path + (child.element,)))
+
+    def __len__(self):
+        counts = {}
+        stack = list(self.roots)
+        while stack:
+            node = stack[-1]
+            if id(node) in counts:
+                stack.pop()
+                continue
+            pending = [child for child in node.children.values() if not id(child) in counts]
+            if pending:
+                stack.extend(pending)
+                continue
+            stack.pop()
+            counts[id(node)] = sum(counts[id(child)] for child in node.children.values()) or 1
+        return sum(counts[id(node)] for node in self.roots)
+
+    def __contains__(self, path):
+        nodes = dict((node.element, node) for node in self.roots)
+        node = None
+        for element in path:
+            if not element in nodes:
+                return False
+            node = nodes[element]
+            nodes = node.children
+        return node is not None and not node.children
+
+    def __nonzero__(self):
+        return bool(self.roots)
+
+    def __eq__(self, other):
+        if isinstance(other, (FailurePaths, set, frozenset)):
+            return set(self) == set(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        result = self.__eq__(other)
+        if result is NotImplemented:
+            return result
+        return not result
+
+    __hash__ = None
+
+    def __repr__(self):
+        return 'FailurePaths({0!r})'.format(set(self))
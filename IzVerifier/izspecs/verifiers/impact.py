@@ -0,0 +1,69 @@
+from collections import deque
+
+__author__ = 'fcanas'
+
+
+class ImpactIndex():
+    """
+    Reverse-dependency index of an installer's conditions and variables, used to find everything that
+    depends on a condition or variable before it is removed or renamed.
+
+    Conditions depend on the conditions they refer to, and 'variable' and 'exists' conditions on the
+    variable they test. References are the (id, location) tuples found in specs and source code for
+    each kind of id. The index is built once, so queries don't scan anything.
+    """
+
+    kinds = ['conditions', 'variables']
+    variable_condition_types = ['variable', 'exists']
+
+    def __init__(self, conditions, references):
+        """
+        Conditions is the IzConditions container.
+        References is a dict mapping each kind of id, 'conditions' or 'variables', to the set of
+        (id, location) references found for it in specs and source code.
+        """
+        self.dependents = dict((kind, {}) for kind in self.kinds)
+        self.references = dict((kind, {}) for kind in self.kinds)
+
+        for cid, condition in conditions.container.items():
+            for ref in condition.refs:
+                self.dependents['conditions'].setdefault(ref, set()).add(cid)
+            if condition.type in self.variable_condition_types and condition.value:
+                self.dependents['variables'].setdefault(str(condition.value), set()).add(cid)
+
+        for kind in self.kinds:
+            for reference in references.get(kind, ()):
+                self.references[kind].setdefault(reference[0], set()).add(reference)
+
+    def dependent_conditions(self, rid, kind='conditions'):
+        """
+        Returns the set of ids of the conditions that depend on the given id, directly or transitively.
+        """
+        found = set()
+        queue = deque(self.dependents[kind].get(rid, ()))
+        while queue:
+            cid = queue.popleft()
+            if cid in found:
+                continue
+            found.add(cid)
+            queue.extend(self.dependents['conditions'].get(cid, ()))
+        return found
+
+    def impact(self, rid, kinds=None):
+        """
+        Returns what depends on the condition or variable with the given id, in the form:
+        {
+            'conditions': set(ids of the conditions that depend on it, directly or transitively),
+            'references': set((id, location) of the references to it and to those conditions)
+        }
+        Kinds restricts the id to conditions or variables; by default it is looked up as both.
+        """
+        conditions = set()
+        references = set()
+        for kind in kinds or self.kinds:
+            conditions |= self.dependent_conditions(rid, kind)
+            references |= self.references[kind].get(rid, set())
+
+        for cid in conditions:
+            references |= self.references['conditions'].get(cid, set())
+        return {'conditions': conditions, 'references': references}
@@ -0,0 +1,130 @@
+from collections import deque
+import re
+
+from IzVerifier.izspecs.verifiers.symbols import SymbolIndex
+
+__author__ = 'fcanas'
+
+
+class ImportGraph():
+    """
+    Graph of the custom classes of a source tree, built with a single search of all of their files.
+
+    Each class has an edge to the custom classes it imports, explicitly or statically, to the classes
+    of wildcard-imported packages and of its own package that it refers to by name, and to the classes
+    it refers to by fully qualified name. Classes in izpack and java packages are left out, as they
+    were when imports were grepped class by class.
+    """
+
+    line_pattern = '\S'
+    import_matcher = SymbolIndex.import_matcher
+    package_matcher = SymbolIndex.package_matcher
+    name_matcher = re.compile('[A-Za-z_$][\w$]*(?:\.[A-Za-z_$][\w$]*)*')
+    white_list_matcher = re.compile('^(com\.izforge\.izpack|java).*$')
+
+    def __init__(self, classes, scanner):
+        """
+        Classes is a map of class ids to the paths of their source files, as held by IzClasses.
+        Scanner is the source scanning backend the files are searched with.
+        """
+        self.ids = {}
+        self.packages = {}
+        self.paths = {}
+        for class_id, path in classes.items():
+            class_id = class_id.strip('.')
+            self.ids[class_id] = path
+            self.paths[path] = class_id
+            if '.' in class_id:
+                package, name = class_id.rsplit('.', 1)
+            else:
+                package, name = '', class_id
+            self.packages.setdefault(package, {})[name] = path
+
+        self.edges = {}
+        files = sorted(self.paths)
+        contents = dict((path, []) for path in files)
+        if files:
+            for line in scanner.search_files(files, [self.line_pattern])[self.line_pattern]:
+                if not ':' in line:
+                    continue
+                path, text = line.split(':', 1)
+                if path in contents:
+                    contents[path].append(text)
+        for path in files:
+            self.edges[path] = self.file_edges(path, contents[path])
+
+    def file_edges(self, path, lines):
+        """
+        Returns the set of paths of the custom classes the file at path, made of the given lines, depends on.
+        """
+        package = None
+        imports = set()
+        wildcards = []
+        body = []
+        for text in lines:
+            statement = text.lstrip()
+            if statement.startswith('import'):
+                match = self.import_matcher.match(text)
+                if match:
+                    static, name, wildcard = match.groups()
+                    if static and not wildcard and '.' in name:
+                        imports.add(name.rsplit('.', 1)[0])
+                    elif static or not wildcard:
+                        imports.add(name)
+                    else:
+                        wildcards.append(name)
+                    continue
+            elif statement.startswith('package'):
+                match = self.package_matcher.match(text)
+                if match:
+                    package = match.group(1)
+                    continue
+            body.append(text)
+        names = set(self.name_matcher.findall('\n'.join(body)))
+
+        if package is None:
+            class_id = self.paths[path]
+            package = class_id.rsplit('.', 1)[0] if '.' in class_id else ''
+
+        targets = set()
+        for name in imports:
+            targets.add(self.resolve(name))
+        scopes = [self.packages[scope] for scope in [package] + wildcards if scope in self.packages]
+        for name in names:
+            first = name.split('.', 1)[0]
+            for scope in scopes:
+                if first in scope:
+                    targets.add(scope[first])
+            if '.' in name:
+                targets.add(self.resolve(name))
+
+        targets.discard(None)
+        targets.discard(path)
+        return set(target for target in targets if not self.white_list_matcher.match(self.paths[target]))
+
+    def resolve(self, name):
+        """
+        Returns the path of the custom class with the given qualified name, or of the outermost class
+        it is nested in, or None if it isn't a custom class.
+        """
+        while name:
+            if name in self.ids:
+                return self.ids[name]
+            if not '.' in name:
+                return None
+            name = name.rsplit('.', 1)[0]
+        return None
+
+    def reachable(self, paths):
+        """
+        Returns the set of paths of the classes reachable from the classes at the given paths, them
+        included, with a single traversal from all of them.
+        """
+        found = set(path for path in paths if path in self.edges)
+        queue = deque(found)
+        while queue:
+            for target in self.edges[queue.popleft()]:
+                if not target in found:
+                    found.add(target)
+                    queue.append(target)
+        return found
@@ -0,0 +1,243 @@
+import os
+import hashlib
+import cPickle
+
+__author__ = 'fcanas'
+
+
+class ReferenceIndex():
+    """
+    Index of the references found in each source and spec file, so that later searches only
+    need to rescan the files that changed.
+
+    Each file is fingerprinted by its size, modification time and content hash. A file whose
+    size or modification time changed is hashed again, and only if its content changed are its
+    indexed hits dropped.
+
+    Hits are indexed by query, a key identifying the search that found them, and by file. A file's
+    hits may also depend on other files, as when they resolve constants declared elsewhere; those
+    hits are dropped as well when any of its dependencies changes.
+
+    If a path is given, the index is loaded from and saved to a SQLite database at that path;
+    otherwise it is only kept in memory.
+    """
+
+    # Bumped whenever the way hits are found changes, to discard indexes built by older versions.
+    version = '3'
+
+    def __init__(self, path=None):
+        self.path = path
+        self.fingerprints = {}
+        self.entries = {}
+        self.dependencies = {}
+        self.dirty_files = set()
+        self.dirty_entries = set()
+        self.dropped = set()
+        self.hits = 0
+        self.misses = 0
+        self.connection = None
+        # Functions returning the current digest of the dependencies that aren't files, by name.
+        self.virtual = {}
+        if path:
+            self.open(path)
+
+    def open(self, path):
+        """
+        Opens the SQLite index at path, creating it if needed, and loads its contents.
+        """
+        import sqlite3
+        # The daemon uses the index from its handler threads, one request at a time.
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.text_factory = str
+        with self.connection:
+            self.connection.execute('CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS files '
+                                    '(path TEXT PRIMARY KEY, size INTEGER, mtime REAL, digest TEXT)')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS hits '
+                                    '(query TEXT, path TEXT, payload BLOB, PRIMARY KEY (query, path))')
+            self.connection.execute('CREATE TABLE IF NOT EXISTS dependencies '
+                                    '(path TEXT, dependency TEXT, digest TEXT, PRIMARY KEY (path, dependency))')
+
+            row = self.connection.execute("SELECT value FROM meta WHERE key = 'version'").fetchone()
+            if row is None or row[0] != self.version:
+                self.connection.execute('DELETE FROM files')
+                self.connection.execute('DELETE FROM hits')
+                self.connection.execute('DELETE FROM dependencies')
+                self.connection.execute("INSERT OR REPLACE INTO meta VALUES ('version', ?)", (self.version,))
+
+        for path, size, mtime, digest in self.connection.execute('SELECT path, size, mtime, digest FROM files'):
+            self.fingerprints[path] = (size, mtime, digest)
+        for query, path, payload in self.connection.execute('SELECT query, path, payload FROM hits'):
+            self.entries.setdefault(path, {})[query] = cPickle.loads(str(payload))
+        for path, dependency, digest in self.connection.execute('SELECT path, dependency, digest FROM dependencies'):
+            self.dependencies.setdefault(path, {})[dependency] = digest
+
+    @staticmethod
+    def query_key(*parts):
+        """
+        Returns the key identifying a search made of the given parts (patterns, white lists, etc).
+        """
+        return hashlib.sha1(repr(parts)).hexdigest()
+
+    def check(self, path):
+        """
+        Returns True if the file at path and its dependencies are unchanged since it was indexed.
+        Otherwise, drops everything indexed for it and returns False.
+        """
+        if not self.check_file(path):
+            return False
+
+        for dependency, digest in self.dependencies.get(path, {}).items():
+            if self.dependency_digest(dependency) != digest:
+                self.drop(path)
+                return False
+        return True
+
+    def dependency_digest(self, dependency):
+        """
+        Returns the current digest of a dependency, either a file or one of the virtual dependencies,
+        or None if it no longer exists.
+        """
+        if dependency in self.virtual:
+            return self.virtual[dependency]()
+        self.check_file(dependency)
+        if dependency in self.fingerprints:
+            return self.fingerprints[dependency][2]
+        return None
+
+    def check_file(self, path):
+        """
+        Returns True if the file at path is unchanged since it was indexed. Otherwise, drops
+        everything indexed for it, records its new fingerprint and returns False.
+        """
+        try:
+            stat = os.stat(path)
+        except OSError:
+            self.forget(path)
+            return False
+
+        fingerprint = self.fingerprints.get(path)
+        if fingerprint and fingerprint[0] == stat.st_size and fingerprint[1] == stat.st_mtime:
+            return True
+
+        digest = file_digest(path)
+        self.fingerprints[path] = (stat.st_size, stat.st_mtime, digest)
+        self.dirty_files.add(path)
+        if fingerprint and fingerprint[2] == digest:
+            # Touched, but not changed.
+            return True
+
+        self.drop(path)
+        return False
+
+    def drop(self, path):
+        """
+        Drops all hits indexed for the file at path.
+        """
+        for query in self.entries.pop(path, {}):
+            self.dirty_entries.discard((query, path))
+        self.dependencies.pop(path, None)
+        self.dropped.add(path)
+
+    def forget(self, path):
+        """
+        Drops everything indexed for the file at path, which was deleted.
+        """
+        self.drop(path)
+        self.fingerprints.pop(path, None)
+        self.dirty_files.discard(path)
+
+    def prune(self, root, paths):
+        """
+        Forgets the files indexed under the folder at root that are not among the given paths, which
+        are all of the files now found under it.
+        """
+        prefix = os.path.join(root, '')
+        paths = set(paths)
+        for path in set(self.fingerprints) | set(self.entries):
+            if path.startswith(prefix) and not path in paths:
+                self.forget(path)
+
+    def get(self, query, path):
+        """
+        Returns the set of hits indexed for the query in the file at path, or None if there are none.
+        The file should have been checked first.
+        """
+        hits = self.entries.get(path, {}).get(query)
+        if hits is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return hits
+
+    def store(self, query, path, hits):
+        """
+        Indexes the set of hits found for the query in the file at path.
+        """
+        self.entries.setdefault(path, {})[query] = set(hits)
+        self.dirty_entries.add((query, path))
+
+    def depend(self, path, dependencies):
+        """
+        Records that the hits indexed for the file at path depend on the given files as they are now.
+        """
+        recorded = self.dependencies.setdefault(path, {})
+        for dependency in dependencies:
+            if dependency == path:
+                continue
+            digest = self.dependency_digest(dependency)
+            if digest is not None:
+                recorded[dependency] = digest
+        self.dirty_files.add(path)
+
+    def save(self):
+        """
+        Writes all changes to the index to its SQLite database, if it has one.
+        """
+        if self.connection is None:
+            return
+        if not (self.dropped or self.dirty_files or self.dirty_entries):
+            return
+
+        import sqlite3
+        with self.connection:
+            for path in self.dropped:
+                self.connection.execute('DELETE FROM hits WHERE path = ?', (path,))
+                self.connection.execute('DELETE FROM dependencies WHERE path = ?', (path,))
+                if not path in self.fingerprints:
+                    self.connection.execute('DELETE FROM files WHERE path = ?', (path,))
+            for path in self.dirty_files:
+                if path in self.fingerprints:
+                    self.connection.execute('INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?)',
+                                            (path,) + self.fingerprints[path])
+                for dependency, digest in self.dependencies.get(path, {}).items():
+                    self.connection.execute('INSERT OR REPLACE INTO dependencies VALUES (?, ?, ?)',
+                                            (path, dependency, digest))
+            for query, path in self.dirty_entries:
+                hits = self.entries[path][query]
+                payload = sqlite3.Binary(cPickle.dumps(hits, cPickle.HIGHEST_PROTOCOL))
+                self.connection.execute('INSERT OR REPLACE INTO hits VALUES (?, ?, ?)', (query, path, payload))
+
+        self.dropped = set()
+        self.dirty_files = set()
+        self.dirty_entries = set()
+
+    def close(self):
+        """
+        Saves and closes the index.
+        """
+        self.save()
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+
+def file_digest(path):
+    """
+    Returns the sha1 digest of the content of the file at path.
+    """
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(65536), ''):
+            digest.update(block)
+    return digest.hexdigest()
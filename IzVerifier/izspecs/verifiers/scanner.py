@@ -0,0 +1,527 @@
+import base64
+from collections import OrderedDict
+import json
+import os
+import re
+
+from IzVerifier.exceptions.IzVerifierException import IzArgumentsException
+from IzVerifier.logging.instrumentation import NULL_INSTRUMENTATION
+
+__author__ = 'fcanas'
+
+
+class GrepScanner:
+    """
+    Source scanning backend that shells out to 'grep -P -R' for every search.
+    """
+
+    name = 'grep'
+    instrument = NULL_INSTRUMENTATION
+
+    # Most files passed to a single grep call when searching a list of files.
+    files_per_call = 500
+
+    def search(self, path, pattern):
+        """
+        Returns the output lines of grep for the given pattern at the given path.
+        """
+        return list(self.iter_search(path, pattern))
+
+    def iter_search(self, path, pattern):
+        """
+        Yields the output lines of grep for the given pattern at the given path as grep writes them.
+        Grep is killed if the lines aren't all consumed.
+        """
+        return self.run(['grep', '-P', '-R', '-e', pattern, path])
+
+    def search_many(self, path, patterns):
+        """
+        Runs each of the given patterns through its own grep call. Returns a dict
+        mapping each pattern to its output lines.
+        """
+        return collect(self.iter_search_many(path, patterns), patterns)
+
+    def iter_search_many(self, path, patterns):
+        """
+        Yields a (pattern, line) pair for each output line of the grep call of each of the given patterns.
+        """
+        for pattern in patterns:
+            lines = self.iter_search(path, pattern)
+            try:
+                for line in lines:
+                    yield pattern, line
+            finally:
+                lines.close()
+
+    def search_files(self, files, patterns):
+        """
+        Runs each of the given patterns through grep over the given files. Returns a dict mapping
+        each pattern to its output lines, each prefixed by the file it was found in.
+        """
+        return collect(self.iter_search_files(files, patterns), patterns)
+
+    def iter_search_files(self, files, patterns):
+        """
+        Yields a (pattern, line) pair for each output line of grep for each of the given patterns over
+        the given files, as search_files finds them.
+        """
+        for pattern in patterns:
+            for start in range(0, len(files), self.files_per_call):
+                lines = self.run(['grep', '-P', '-H', '-e', pattern] + files[start:start + self.files_per_call])
+                try:
+                    for line in lines:
+                        yield pattern, line
+                finally:
+                    lines.close()
+
+    def run(self, cmd):
+        """
+        Yields the output lines of the given grep command as they come. Grep exits with 1 when
+        nothing matched, which simply yields no lines.
+        """
+        import subprocess
+        self.instrument.count('subprocesses')
+        lines = output_lines(subprocess.Popen(cmd, stdout=subprocess.PIPE))
+        try:
+            for line in lines:
+                yield line
+        finally:
+            lines.close()
+
+    def files(self, root):
+        """
+        Returns the paths to every file found under the given root.
+        """
+        return walk_files(root)
+
+    def forget(self, paths):
+        """
+        Nothing read from files is kept, so there is nothing to forget when they change.
+        """
+        pass
+
+
+class SourceScanner:
+    """
+    In-process source scanning backend.
+
+    Each source root is walked once and the lines of every file read are kept in memory,
+    so later searches of the same root or of any single file under it never touch the
+    disk again. Output lines are formatted exactly like grep's:
+
+    'path/to/File.java:matching line' when searching a folder.
+    'matching line' when searching a single file.
+    """
+
+    name = 'python'
+    instrument = NULL_INSTRUMENTATION
+
+    def __init__(self):
+        self.roots = {}
+        self.lines = {}
+        self.compiled = OrderedDict()
+
+    def search(self, path, pattern):
+        """
+        Returns all lines under the given path matching the pattern.
+        """
+        return list(self.iter_search(path, pattern))
+
+    def iter_search(self, path, pattern):
+        """
+        Yields the lines under the given path matching the pattern, one file at a time.
+        """
+        if os.path.isdir(path):
+            files, prefixed = self.walk(path), True
+        elif os.path.isfile(path):
+            files, prefixed = [path], False
+        else:
+            return
+
+        matcher = self.compile(pattern)
+        evaluations = 0
+        try:
+            for source in files:
+                lines = self.read(source)
+                evaluations += len(lines)
+                for line in lines:
+                    if matcher.search(line):
+                        yield source + ':' + line if prefixed else line
+        finally:
+            self.instrument.count('regex evaluations', evaluations)
+
+    def search_many(self, path, patterns):
+        """
+        Runs all of the given patterns against a single pass over the files at the given path.
+        Returns a dict mapping each pattern to its matching lines.
+        """
+        return collect(self.iter_search_many(path, patterns), patterns)
+
+    def iter_search_many(self, path, patterns):
+        """
+        Yields a (pattern, line) pair for each line under the given path matching each of the patterns,
+        in a single pass over the files.
+        """
+        if os.path.isdir(path):
+            return self.scan(self.walk(path), patterns, True)
+        if os.path.isfile(path):
+            return self.scan([path], patterns, False)
+        return iter([])
+
+    def search_files(self, files, patterns):
+        """
+        Runs all of the given patterns against a single pass over the given files. Returns a dict
+        mapping each pattern to its matching lines, each prefixed by the file it was found in.
+        """
+        return collect(self.iter_search_files(files, patterns), patterns)
+
+    def iter_search_files(self, files, patterns):
+        """
+        Yields a (pattern, line) pair for each line of the given files matching each of the patterns,
+        prefixed by the file it was found in, in a single pass over the files.
+        """
+        return self.scan(files, patterns, True)
+
+    def scan(self, files, patterns, prefixed):
+        """
+        Yields a (pattern, line) pair for each line of the given files matching each of the patterns,
+        one file at a time, prefixed by the file it was found in if prefixed is True.
+        """
+        matchers = [(pattern, self.compile(pattern)) for pattern in patterns]
+        evaluations = 0
+        try:
+            for source in files:
+                prefix = source + ':' if prefixed else ''
+                lines = self.read(source)
+                evaluations += len(lines) * len(matchers)
+                for line in lines:
+                    for pattern, matcher in matchers:
+                        if matcher.search(line):
+                            yield pattern, prefix + line
+        finally:
+            self.instrument.count('regex evaluations', evaluations)
+
+    def files(self, root):
+        """
+        Returns the paths to every file found under the given root.
+        """
+        return self.walk(root)
+
+    def walk(self, root):
+        """
+        Returns the paths to every file found under the given root, walking it only once.
+        """
+        if not root in self.roots:
+            self.roots[root] = walk_files(root)
+        return self.roots[root]
+
+    def forget(self, paths):
+        """
+        Drops the lines kept for the files at the given paths, which changed. Roots are walked again
+        if any of the files was added or removed.
+        """
+        walked = set()
+        for files in self.roots.values():
+            walked.update(files)
+        for path in paths:
+            self.lines.pop(path, None)
+            if (path in walked) != os.path.isfile(path):
+                self.roots = {}
+
+    def read(self, path):
+        """
+        Returns the lines of the file at the given path. Binary files have no lines.
+        """
+        if not path in self.lines:
+            self.instrument.count('files read')
+            try:
+                with open(path, 'rb') as f:
+                    content = f.read()
+            except IOError:
+                content = ''
+
+            if '\0' in content:
+                lines = []
+            else:
+                lines = content.split('\n')
+                if content.endswith('\n'):
+                    lines.pop()
+            self.lines[path] = lines
+        return self.lines[path]
+
+    def compile(self, pattern):
+        """
+        Returns the compiled regex for the given grep pattern.
+        """
+        return compile_cached(self.compiled, pattern)
+
+
+class RipgrepScanner:
+    """
+    Source scanning backend that runs ripgrep ('rg'), with all the patterns of a search in a single
+    invocation, and honors .gitignore and .ignore files.
+
+    ripgrep's --json output is parsed into structured (path, line number, line) matches, and each
+    matching line is then attributed to the patterns it matches with the same regexes as the in-process
+    scanner. Output lines are formatted exactly like grep's, as the Seeker expects from every backend.
+    """
+
+    name = 'ripgrep'
+    executable = 'rg'
+    instrument = NULL_INSTRUMENTATION
+
+    # Most files passed to a single rg call when searching a list of files.
+    files_per_call = 500
+
+    def __init__(self):
+        self.compiled = OrderedDict()
+
+    def search(self, path, pattern):
+        """
+        Returns all lines under the given path matching the pattern.
+        """
+        return list(self.iter_search(path, pattern))
+
+    def iter_search(self, path, pattern):
+        """
+        Yields the lines under the given path matching the pattern as rg finds them.
+        rg is killed if the lines aren't all consumed.
+        """
+        if not os.path.exists(path):
+            return
+        prefixed = os.path.isdir(path)
+        for source, number, text in self.matches([path], [pattern]):
+            yield source + ':' + text if prefixed else text
+
+    def search_many(self, path, patterns):
+        """
+        Runs all of the given patterns through a single rg call over the given path. Returns a dict
+        mapping each pattern to its matching lines.
+        """
+        return collect(self.iter_search_many(path, patterns), patterns)
+
+    def iter_search_many(self, path, patterns):
+        """
+        Yields a (pattern, line) pair for each line under the given path matching each of the patterns,
+        as a single rg call finds them.
+        """
+        if not os.path.exists(path):
+            return iter([])
+        return self.attribute(self.matches([path], patterns), patterns, os.path.isdir(path))
+
+    def search_files(self, files, patterns):
+        """
+        Runs all of the given patterns through rg over the given files. Returns a dict mapping each
+        pattern to its matching lines, each prefixed by the file it was found in.
+        """
+        return collect(self.iter_search_files(files, patterns), patterns)
+
+    def iter_search_files(self, files, patterns):
+        """
+        Yields a (pattern, line) pair for each line of the given files matching each of the patterns,
+        prefixed by the file it was found in, as rg finds them.
+        """
+        for start in range(0, len(files), self.files_per_call):
+            pairs = self.attribute(self.matches(files[start:start + self.files_per_call], patterns), patterns, True)
+            try:
+                for pair in pairs:
+                    yield pair
+            finally:
+                pairs.close()
+
+    def files(self, root):
+        """
+        Returns the paths to every file found under the given root that isn't ignored, in a stable order.
+        """
+        output = self.run(['--files', root])
+        return sorted(line for line in output.split('\n') if line)
+
+    def forget(self, paths):
+        """
+        Nothing read from files is kept, so there is nothing to forget when they change.
+        """
+        pass
+
+    def matches(self, paths, patterns):
+        """
+        Yields the (path, line number, line) of every line of the files at the given paths that
+        matches any of the patterns, as rg finds them.
+        """
+        if not paths or not patterns:
+            return
+        args = ['--json']
+        for pattern in patterns:
+            args += ['-e', pattern]
+
+        for line in self.stream(args + ['--'] + list(paths)):
+            if not line.startswith('{"type":"match"'):
+                continue
+            data = json.loads(line)['data']
+            text = json_text(data['lines'])
+            if text.endswith('\n'):
+                text = text[:-1]
+            yield json_text(data['path']), data['line_number'], text
+
+    def attribute(self, matches, patterns, prefixed):
+        """
+        Yields a (pattern, line) pair for each of the patterns each matching line matches, the line
+        prefixed by its path if prefixed is True.
+        """
+        matchers = [(pattern, self.compile(pattern)) for pattern in patterns]
+        count = 0
+        try:
+            for path, number, text in matches:
+                line = path + ':' + text if prefixed else text
+                for pattern, matcher in matchers:
+                    if matcher.search(text):
+                        yield pattern, line
+                count += 1
+        finally:
+            matches.close()
+            self.instrument.count('regex evaluations', count * len(matchers))
+
+    def run(self, args):
+        """
+        Runs rg with the given arguments, and returns its output. rg exits with 1 when nothing matched,
+        and with 2 on errors, which only fail the search if nothing was output.
+        """
+        import subprocess
+        self.instrument.count('subprocesses')
+        process = subprocess.Popen(self.command(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        output, errors = process.communicate()
+        if process.returncode > 1 and not output:
+            raise IzArgumentsException('ripgrep failed: ' + errors.strip())
+        return output
+
+    def stream(self, args):
+        """
+        Runs rg with the given arguments, and yields its output lines as they come. Errors are
+        handled as in run.
+        """
+        import subprocess
+        self.instrument.count('subprocesses')
+        process = subprocess.Popen(self.command(args), stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+        lines = output_lines(process)
+        output = False
+        try:
+            for line in lines:
+                output = True
+                yield line
+        finally:
+            lines.close()
+            errors = process.stderr.read()
+            process.stderr.close()
+        if process.returncode > 1 and not output:
+            raise IzArgumentsException('ripgrep failed: ' + errors.strip())
+
+    def command(self, args):
+        """
+        Returns the rg command line for the given arguments.
+        """
+        return [self.executable, '--follow', '--no-messages', '--engine', 'auto'] + args
+
+    def compile(self, pattern):
+        """
+        Returns the compiled regex for the given grep pattern.
+        """
+        return compile_cached(self.compiled, pattern)
+
+
+# Most compiled regexes kept by each cache. A full cache drops its oldest regex, one at a time, so that
+# long-lived verifiers running ever new searches don't grow it without bounds, while the patterns of the
+# searches in progress stay compiled.
+MAX_COMPILED = 500
+
+
+def compile_cached(cache, pattern):
+    """
+    Returns the compiled regex for the given pattern, kept in the given OrderedDict in the order the
+    patterns were compiled. Lookups don't reorder the cache, so that they cost no more than a dict's.
+    """
+    matcher = cache.get(pattern)
+    if matcher is None:
+        if len(cache) >= MAX_COMPILED:
+            cache.popitem(last=False)
+        matcher = cache[pattern] = re.compile(pattern)
+    return matcher
+
+
+def collect(pairs, patterns):
+    """
+    Returns a dict mapping each of the given patterns to the lines paired with it.
+    """
+    results = dict((pattern, []) for pattern in patterns)
+    for pattern, line in pairs:
+        results[pattern].append(line)
+    return results
+
+
+def json_text(value):
+    """
+    Returns the text of a ripgrep JSON string value, which holds either utf-8 'text' or base64 'bytes'.
+    """
+    if 'text' in value:
+        return value['text'].encode('utf-8')
+    return base64.b64decode(value['bytes'])
+
+
+def output_lines(process):
+    """
+    Yields the lines a subprocess writes to its standard output as they come, without their line
+    breaks, so its output is never held in memory all at once. If the lines aren't all consumed,
+    the process is killed when the generator is closed.
+    """
+    try:
+        for line in process.stdout:
+            yield line[:-1] if line.endswith('\n') else line
+    finally:
+        if process.poll() is None:
+            process.kill()
+        process.stdout.close()
+        process.wait()
+
+
+def walk_files(root):
+    """
+    Returns the paths to every file found under the given root, in a stable order.
+    """
+    files = []
+    for paths, dirs, names in os.walk(root, followlinks=True):
+        dirs.sort()
+        for name in sorted(names):
+            files.append(os.path.join(paths, name))
+    return files
+
+
+SCANNERS = {
+    GrepScanner.name: GrepScanner,
+    SourceScanner.name: SourceScanner,
+    RipgrepScanner.name: RipgrepScanner
+}
+
+
+def get_scanner(name=None):
+    """
+    Returns a new scanner backend for the given name. The in-process scanner is the default, and
+    'auto' selects ripgrep if rg is installed, or else the in-process scanner.
+    """
+    if name is None:
+        name = SourceScanner.name
+    if name == 'auto':
+        name = RipgrepScanner.name if find_executable(RipgrepScanner.executable) else SourceScanner.name
+    if not name in SCANNERS:
+        raise IzArgumentsException("Unknown source scanner: " + str(name))
+    if name == RipgrepScanner.name and not find_executable(RipgrepScanner.executable):
+        raise IzArgumentsException("ripgrep (rg) not found")
+    return SCANNERS[name]()
+
+
+def find_executable(name):
+    """
+    Returns the path of the named executable if it is found on the PATH, or None.
+    """
+    for folder in os.environ.get('PATH', '').split(os.pathsep):
+        path = os.path.join(folder, name)
+        if os.path.isfile(path) and os.access(path, os.X_OK):
+            return path
+    return None
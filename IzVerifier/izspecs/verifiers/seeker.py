@@ -1,6 +1,10 @@
-import subprocess
+import os
 import re
-from bs4 import BeautifulSoup
+from collections import OrderedDict
+from IzVerifier.izspecs.izdocuments import IzDocuments
+from IzVerifier.izspecs.verifiers.scanner import compile_cached, get_scanner
+from IzVerifier.izspecs.verifiers.symbols import SymbolIndex
+from IzVerifier.logging.instrumentation import NULL_INSTRUMENTATION
 
 
 class Seeker:
@@ -12,9 +16,93 @@ class Seeker:
     grep_comment_pattern = '^\s*[(//)*].+.*$'
     comment_matcher = re.compile(grep_comment_pattern)
     grep_whitelist_patterns = []
-
-    def __init__(self, paths):
+    literal_matcher = re.compile('^"[\w].*"$')
+    compound_matcher = re.compile('^[\"\w].*[\+].+[\w].*$')
+    variable_matcher = re.compile('^[\w]+$')
+    import_matcher = re.compile('^\s*[\w\.]+$')
+    method_key_matcher = re.compile('\((.*)')
+    messages_matcher = re.compile('^Messages (\w+)')
+    constant_search_pattern = 'String \w+ = "'
+    constant_matcher = re.compile('String (\w+) = (".*?")')
+
+    # Number of shards each worker gets when source files are searched in parallel.
+    shards_per_worker = 4
+
+    def __init__(self, paths, scanner=None, documents=None, index=None, workers=1, classes=None,
+                 instrument=NULL_INSTRUMENTATION, max_hits=None):
+        """
+        Scanner is the source scanning backend to use, or the name of one ('python' or 'grep').
+        Documents is the IzDocuments cache that spec files are parsed through.
+        Index is an optional ReferenceIndex holding the hits of earlier searches, so that only
+        files changed since then are searched again.
+        Workers is the number of processes that source folders are searched with.
+        Classes is an optional map of custom class ids to their source files, as held by IzClasses,
+        used to resolve String constants declared in other classes, or a function returning it, called
+        the first time a constant has to be resolved that way.
+        Instrument is the Instrumentation recording the seeker's phases and events.
+        Max_hits optionally caps the hits of each pattern: the scanner output of a search is no longer
+        read once that many hits are found in it. Folders searched file by file, as through the index
+        or by workers, are capped file by file.
+        """
         self.paths = paths
+        self.max_hits = max_hits
+        self.instrument = instrument
+        self.index = index
+        self.workers = workers
+        self.constants = {}
+        self.whitelists = {}
+        self.set_classes(classes)
+        if not documents:
+            documents = IzDocuments()
+        self.documents = documents
+        if scanner is None or isinstance(scanner, basestring):
+            scanner = get_scanner(scanner)
+        self.scanner = scanner
+        if instrument.enabled:
+            self.scanner.instrument = instrument
+
+    def forget(self, paths, classes=None):
+        """
+        Drops everything read from the source files at the given paths, which changed, so that only
+        they are read again. Classes is the new map of custom class ids to their source files.
+        """
+        paths = set(paths)
+        self.scanner.forget(paths)
+        for key in self.constants.keys():
+            if key[0] in paths:
+                del self.constants[key]
+        self.set_classes(classes)
+
+    def set_classes(self, classes):
+        """
+        Sets the map of custom class ids to their source files that constants are resolved through.
+        Indexed hits that depend on the map are searched again if it changed since they were indexed.
+        """
+        self._classes = classes
+        self._symbols = None
+        if self.index is not None:
+            if classes is not None:
+                self.index.virtual[SymbolIndex.classes_dependency] = lambda: self.symbols.digest()
+            else:
+                self.index.virtual.pop(SymbolIndex.classes_dependency, None)
+
+    @property
+    def classes(self):
+        """
+        The map of custom class ids to their source files, or None.
+        """
+        if callable(self._classes):
+            self._classes = self._classes()
+        return self._classes
+
+    @property
+    def symbols(self):
+        """
+        The SymbolIndex resolving constants through the custom classes, built on first use, or None.
+        """
+        if self._symbols is None and self.classes is not None:
+            self._symbols = SymbolIndex(self, self.classes)
+        return self._symbols
 
     def search_specs_for_attributes(self, args):
         """
@@ -29,7 +117,8 @@ class Seeker:
              'filter_fn': a filtering function for xml elements,
              'attributes': a list of the attributes to extract from matching elements,
              'value_fn': a function that filters the extracted values,
-             'transform_fn': a function to transform matching values to some form.
+             'transform_fn': a function to transform matching values to some form,
+             'index_key': optional key identifying the filter_fn and transform_fn, to index hits by.
         }
 
          For example:
@@ -44,6 +133,16 @@ class Seeker:
 
          the default transform_fn is just the identify function: ie it doesn't transform, just
          returns the input value.
+
+         If the seeker has an index and an index_key is given, the hits found in each spec
+         file are indexed, and only spec files changed since are searched again.
+        """
+        with self.instrument.phase('spec search'):
+            return self._search_specs_for_attributes(args)
+
+    def _search_specs_for_attributes(self, args):
+        """
+        Runs search_specs_for_attributes, described above.
         """
         values_found_for_attributes = set()
 
@@ -54,25 +153,55 @@ class Seeker:
         transform_fn = args.get('transform_fn', lambda x: x)
         white_list = args.get('white_list_patterns', [])
 
+        query = None
+        if self.index is not None and 'index_key' in args and not 'value_fn' in args:
+            query = self.index.query_key('spec', args['index_key'], tuple(attributes), tuple(white_list))
+
         # Search each of the spec files required for elements that pass the filters
         for spec in specs:
+            if query and os.path.isfile(spec):
+                hits = None
+                if self.index.check(spec):
+                    hits = self.index.get(query, spec)
+                if hits is None:
+                    self.instrument.count('index files rescanned')
+                    hits = self.search_spec_for_attributes(spec, filter_fn, attributes, value_fn,
+                                                           transform_fn, white_list)
+                    self.index.store(query, spec, hits)
+                else:
+                    self.instrument.count('index files reused')
+                values_found_for_attributes |= hits
+            else:
+                values_found_for_attributes |= self.search_spec_for_attributes(spec, filter_fn, attributes, value_fn,
+                                                                               transform_fn, white_list)
+
+        if query:
+            self.index.save()
+        return values_found_for_attributes
+
+    def search_spec_for_attributes(self, spec, filter_fn, attributes, value_fn, transform_fn, white_list):
+        """
+        Searches a single spec file for the values of the given attributes, as described above.
+        """
+        values_found_for_attributes = set()
+        with self.instrument.span('search_spec_for_attributes', spec=spec):
             hits = self.search_specs(filter_fn, spec)
 
-            for tag in attributes:
-                values = self.extract_attributes(hits, tag)
-
-                # For each found value, transform it and add the result to the set
-                for value in values:
-                    transformation = transform_fn(value)
-                    if isinstance(transformation, set) or isinstance(transformation, list):
-                        for transformed_value in transformation:
-                            if value_fn(transformed_value):
-                                if not self.in_grep_whitelist(transformed_value, white_list):
-                                    values_found_for_attributes.add((transformed_value, spec))
-                    else:
-                        if value_fn(transformation):
-                            if not self.in_grep_whitelist(transformation, white_list):
-                                values_found_for_attributes.add((transformation, spec))
+        for tag in attributes:
+            values = self.extract_attributes(hits, tag)
+
+            # For each found value, transform it and add the result to the set
+            for value in values:
+                transformation = transform_fn(value)
+                if isinstance(transformation, set) or isinstance(transformation, list):
+                    for transformed_value in transformation:
+                        if value_fn(transformed_value):
+                            if not self.in_grep_whitelist(transformed_value, white_list):
+                                values_found_for_attributes.add((transformed_value, spec))
+                else:
+                    if value_fn(transformation):
+                        if not self.in_grep_whitelist(transformation, white_list):
+                            values_found_for_attributes.add((transformation, spec))
 
         return values_found_for_attributes
 
@@ -127,70 +256,159 @@ class Seeker:
 
         return spec_hits | source_hits
 
+    def find_id_references_many(self, args):
+        """
+        Performs the search of find_id_references for several ids at once, with a single search of the
+        spec files and a single scan of each source path. Takes the same args, with a list of the ids
+        looked for under 'ids' instead of 'id', and an optional 'index_key' to index the spec search by.
+
+        Returns a dict mapping each id to the set of references find_id_references finds for it.
+        """
+        ids = args['ids']
+        hits = dict((vid, set()) for vid in ids)
+        if not ids:
+            return hits
+
+        # Every value of the attributes, then the values each id matches, as in search_specs_for_value.
+        spec_args = dict(args)
+        del spec_args['ids']
+        values = {}
+        for value, spec in self.search_specs_for_attributes(spec_args):
+            values.setdefault(value, set()).add((value, spec))
+        for vid in ids:
+            matcher = compiled(vid)
+            for value, found in values.items():
+                if not matcher.match(value) is None:
+                    hits[vid] |= found
+
+        source_hits = self.find_ids_in_source(args['patterns'], args['source_paths'], args['white_list_patterns'], ids)
+        for vid in ids:
+            hits[vid] |= source_hits[vid]
+        return hits
+
+    def find_ids_in_source(self, patterns, path_list, white_list_patterns, ids):
+        """
+        Finds the occurrences of the patterns for each of the given ids in the source code at the given
+        paths, as find_references_in_source does for a single id. Each path is scanned once for the lines
+        matching any of the ids, then each id's own patterns are applied to the text of those lines only.
+
+        Returns a dict mapping each id to the set of hits found for it.
+        """
+        hits = dict((vid, set()) for vid in ids)
+        if len(patterns) == 0 or not ids:
+            return hits
+
+        any_id = '(?:' + '|'.join('(?:' + vid + ')' for vid in ids) + ')'
+        search_pattern = self.combine_patterns(patterns, any_id)[0]
+        with self.instrument.phase('source search'):
+            for path in path_list:
+                prefixed = os.path.isdir(path)
+                if prefixed:
+                    pairs = self.scanner.iter_search_files(self.scanner.files(path), [search_pattern])
+                else:
+                    pairs = self.scanner.iter_search_many(path, [search_pattern])
+                outputs = []
+                for vid in ids:
+                    id_search_pattern, id_extract_pattern = self.combine_patterns(patterns, vid)
+                    outputs.append((vid, compiled(id_search_pattern),
+                                    SearchOutput(self, id_search_pattern, id_extract_pattern, white_list_patterns)))
+                for pattern, line in pairs:
+                    # Lines of a directory search start with their path, which mustn't match an id's pattern.
+                    text = line.split(':', 1)[1] if prefixed else line
+                    for vid, matcher, output in outputs:
+                        if matcher.search(text):
+                            output.add(line)
+                for vid, matcher, output in outputs:
+                    hits[vid] |= output.finish()
+        return hits
+
     def find_references_in_source(self, patterns, path_list, white_list_patterns, vid=None):
         """
         Find all occurrences of these patterns at the source code in the given paths.
+        Searches for a single id are not indexed.
         """
         hits = set()
         if len(patterns) != 0:
-            searches, extractors = zip(*patterns)
-            combined_search_pattern = '|'.join(searches)
-            combined_extract_pattern = '|'.join(extractors)
+            search_pattern, extract_pattern = self.combine_patterns(patterns, vid)
+
+            with self.instrument.phase('source search'):
+                for path in path_list:
+                    hits |= self.search_source_for_patterns(path,
+                                                            [(search_pattern, extract_pattern, white_list_patterns)],
+                                                            indexed=vid is None)[0]
+
+        return set(hits)
 
+    def find_references_in_source_many(self, searches, path_list):
+        """
+        Find all occurrences of the patterns of several specs in a single scan of each source path.
+
+        searches = {
+            'spec name': (patterns, white_list_patterns),
+            ...
+        }
+
+        Returns a dict mapping each spec name to the set of hits found for its patterns.
+        """
+        hits = dict((name, set()) for name in searches)
+        names = []
+        combined = []
+        for name, (patterns, white_list_patterns) in searches.items():
+            if len(patterns) != 0:
+                names.append(name)
+                combined.append(self.combine_patterns(patterns) + (white_list_patterns,))
+
+        with self.instrument.phase('source search'):
             for path in path_list:
-                if vid:
-                    search_pattern = combined_search_pattern.format('"' + vid + '"')
-                    extract_pattern = combined_extract_pattern.format('"' + vid + '"')
-                else:
-                    search_pattern = combined_search_pattern.format('.*?')
-                    extract_pattern = combined_extract_pattern.format('.*?')
+                for name, found in zip(names, self.search_source_for_patterns(path, combined)):
+                    hits[name] |= found
+        return hits
 
-                hits |= self.search_source_for_pattern(path,
-                                                       search_pattern,
-                                                       extract_pattern,
-                                                       white_list_patterns)
+    @staticmethod
+    def combine_patterns(patterns, vid=None):
+        """
+        Joins a list of (search pattern, extract pattern) tuples into a single search pattern and
+        a single extract pattern, matching the given id or any key if no id is given.
+        """
+        searches, extractors = zip(*patterns)
+        combined_search_pattern = '|'.join(searches)
+        combined_extract_pattern = '|'.join(extractors)
 
-        return set(hits)
+        if vid:
+            key = '"' + vid + '"'
+        else:
+            key = '.*?'
+        return combined_search_pattern.format(key), combined_extract_pattern.format(key)
 
     @staticmethod
     def match_literal(key):
         # "some literal string";
-        literal_string = '^"[\w].*"$'
-        literal_matcher = re.compile(literal_string)
-        return literal_matcher.match(key)
+        return Seeker.literal_matcher.match(key)
 
     @staticmethod
     def match_compound(key):
         # ie. someVariable + "some literal";
-        compound_mix = '^[\"\w].*[\+].+[\w].*$'
-        compound_matcher = re.compile(compound_mix)
-        return compound_matcher.match(key)
+        return Seeker.compound_matcher.match(key)
 
     @staticmethod
     def match_variable(key):
         # someVariable;
-        variable = '^[\w]+$'
-        variable_matcher = re.compile(variable)
-        return variable_matcher.match(key)
+        return Seeker.variable_matcher.match(key)
 
     @staticmethod
     def match_method(key, pattern):
-        method_matcher = re.search(pattern, key)
+        method_matcher = compiled(pattern).search(key)
         return method_matcher
 
     @staticmethod
     def extract_key_from_method(key):
-        extract_method = '\((.*)'
-        extract_method_pattern = re.compile(extract_method)
-        matched = re.search(extract_method_pattern, key)
+        matched = Seeker.method_key_matcher.search(key)
         return matched.group(1)
 
     @staticmethod
     def match_import(key):
         # "some literal string";
-        literal_string = '^\s*[\w\.]+$'
-        literal_matcher = re.compile(literal_string)
-        return literal_matcher.match(key)
+        return Seeker.import_matcher.match(key)
 
     def process_key(self, key_and_location, white_list, search_pattern):
         """
@@ -216,6 +434,11 @@ class Seeker:
             if key is not None:
                 return key, location
         elif self.match_import(key):
+            # a qualified constant, like Constants.SOME_KEY, is replaced by its value if it can be resolved.
+            if self.symbols is not None:
+                value = self.symbols.resolve_qualified(key, location, white_list)
+                if value is not None:
+                    return value, location
             return key, location
         else:
             return None
@@ -227,18 +450,55 @@ class Seeker:
     def find_variable_value(self, variable, location, white_list):
         """
         Given a variable and its location, attempt to substitute it for its value. The white_list is
-        compared against.
+        compared against. Variables not declared in their own file are looked up through its static
+        imports and supertypes.
         """
-        search_pattern = 'String {0} = \"'.format(variable)
-        extract_pattern = 'String {0} = (\".*?\")'.format(variable)
+        with self.instrument.phase('variable lookups'), \
+                self.instrument.span('find_variable_value', variable=variable, location=location):
+            hits = self.string_constants(location, white_list).get(variable)
 
-        hits = list(self.search_source_for_pattern(location, search_pattern, extract_pattern, white_list))
+            if hits:
 
-        if hits:
+                return list(hits)[0][0]  # first hit
+            elif self.symbols is not None:
+                return self.symbols.resolve_name(variable, location, white_list)
+            else:
+                return None  # unable to id this, so it's runtime.
 
-            return hits[0][0]  # first hit
+    def string_constants(self, location, white_list):
+        """
+        Returns the table of String constants declared in the source file at location, built with a
+        single search of the file the first time it is needed. The table maps each constant's name to
+        the set of its processed (value, location) tuples.
+        """
+        key = (location, tuple(white_list))
+        if key in self.constants:
+            self.instrument.count('constants table hits')
         else:
-            return None  # unable to id this, so it's runtime.
+            self.instrument.count('constants tables built')
+            table = {}
+            for line in self.scanner.search(location, self.constant_search_pattern):
+                if not self.is_valid_output(line, white_list):
+                    continue
+                match_loc = re.search(self.grep_location_pattern, line)
+                if match_loc:
+                    line_location = match_loc.group(1)
+                else:
+                    line_location = "UNKNOWN"
+
+                # Only the first declaration of each name in a line counts.
+                names = set()
+                for match in self.constant_matcher.finditer(line):
+                    name, value = match.groups()
+                    if name in names:
+                        continue
+                    names.add(name)
+                    search_pattern = 'String {0} = \"'.format(name)
+                    key_and_location = self.process_key((value, line_location), white_list, search_pattern)
+                    if key_and_location is not None:
+                        table.setdefault(name, set()).add(key_and_location)
+            self.constants[key] = table
+        return self.constants[key]
 
     def extract_pattern_and_location_from_grep(self, line, extract_pattern):
         """
@@ -281,27 +541,27 @@ class Seeker:
         Given a line of output from a grep output, returns a tuple
         holding the key of the element and the file it was found in.
         """
-        match_key = re.search(extract_pattern, output)
-        match_loc = re.search(self.grep_location_pattern, output)
-        if match_key and match_loc:
-            for match in match_key.groups():
-                if match is not None:
-                    return match, match_loc.group(1)
-        if match_key and not match_loc:
-            for match in match_key.groups():
-                if match is not None:
-                    return match, "UNKNOWN"
-        else:
+        match_key = compiled(extract_pattern).search(output)
+        if not match_key:
             return None
 
-    @staticmethod
-    def search_specs(search_fn, path):
+        # The location is whatever precedes the first colon, as matched by grep_location_pattern.
+        end = output.find(':')
+        if end == -1:
+            location = "UNKNOWN"
+        else:
+            location = output[:end]
+        for match in match_key.groups():
+            if match is not None:
+                return match, location
+
+    def search_specs(self, search_fn, path):
         """
         Scrapes the xml spec file given in path and returns a set of all elements meeting the
         search_fn condition.
         """
         try:
-            soup = BeautifulSoup(open(path), 'xml')
+            soup = self.documents.get(path)
         except IOError:
             return set()
         return soup.find_all(search_fn)
@@ -324,9 +584,7 @@ class Seeker:
 
     def is_messages_object(self, key):
         # ie. Messages message = blah
-        messages_pattern = '^Messages \w+'
-        messages_matcher = re.compile(messages_pattern)
-        return  messages_matcher.match(key)
+        return self.messages_matcher.match(key)
 
     def messages_search_patterns(self, key, full_search_pattern):
 
@@ -335,9 +593,7 @@ class Seeker:
             lookfor = specific_string_search.group(0)
         else:
             lookfor = '.*?'
-        messages_pattern = '^Messages (\w+)'
-        messages_matcher = re.compile(messages_pattern)
-        obj = messages_matcher.match(key).group(1)
+        obj = self.messages_matcher.match(key).group(1)
         search_pattern = obj + '.get\('+lookfor
         extract_pattern = obj + '.get\(({0})\)'.format(lookfor)
         return search_pattern, extract_pattern
@@ -347,36 +603,182 @@ class Seeker:
         Searches all files recursively from given path for the search_pattern.
         Returns a set of all lines containing that pattern.
         """
-        keys = set()
-        cmd_string = "grep -P -R -e '{0}' {1}".format(search_pattern, path)
-        cmd = [cmd_string]
-        try:
-            output = subprocess.check_output(cmd, shell=True)
-            for line in output.split("\n"):
-                check_line = self.is_valid_output(line, white_list)
-                if check_line is False:
-                    key_and_location = None
-                else:
-                    key_and_location = self.extract_pattern_and_location_from_grep(line, extract_pattern)
-                if key_and_location is None:
-                    continue
+        with self.instrument.span('search_source_for_pattern', path=path, pattern=search_pattern):
+            lines = self.scanner.iter_search(path, search_pattern)
+            return self.process_output(lines, search_pattern, extract_pattern, white_list)
+
+    def search_source_for_patterns(self, path, searches, indexed=True):
+        """
+        Runs several searches against a single scan of the given path.
+        Searches is a list of (search_pattern, extract_pattern, white_list) tuples.
+        Returns a list holding the set of hits found for each search, in order.
+
+        Folders are searched through the index, if the seeker has one and indexed is True.
+        """
+        with self.instrument.span('search_source_for_patterns', path=path,
+                                  patterns=[search[0] for search in searches]):
+            return self._search_source_for_patterns(path, searches, indexed)
 
-                if self.is_messages_object(key_and_location[0]):
-                    messages_search_pattern, messages_extract_pattern = self.messages_search_patterns(key_and_location[0], search_pattern)
-                    hits = self.search_source_for_pattern(key_and_location[1], messages_search_pattern, messages_extract_pattern, white_list)
-                    hits_with_location = set()
-                    for hit in hits:
-                        hits_with_location.add((hit[0], key_and_location[1]))
-                    keys = keys|hits_with_location
+    def _search_source_for_patterns(self, path, searches, indexed):
+        """
+        Runs search_source_for_patterns, described above.
+        """
+        if indexed and self.index is not None and os.path.isdir(path):
+            return self.search_indexed_source(path, searches)
+
+        if self.workers > 1 and os.path.isdir(path):
+            results = [set() for search in searches]
+            for result, hits_by_file in zip(results, self.search_files(self.scanner.files(path), searches)[0]):
+                for found in hits_by_file.values():
+                    result |= found
+            return results
+
+        if len(searches) == 1:
+            # A single search streams the scanner output instead of holding all of it.
+            search_pattern, extract_pattern, white_list = searches[0]
+            return [self.process_output(self.scanner.iter_search(path, search_pattern), search_pattern,
+                                        extract_pattern, white_list)]
+
+        outputs = [SearchOutput(self, *search) for search in searches]
+        by_pattern = {}
+        for output in outputs:
+            by_pattern.setdefault(output.search_pattern, []).append(output)
+        pairs = self.scanner.iter_search_many(path, by_pattern.keys())
+        try:
+            for pattern, line in pairs:
+                for output in by_pattern[pattern]:
+                    output.add(line)
+                if self.max_hits and all(output.full() for output in outputs):
+                    break
+        finally:
+            pairs.close()
+        return [output.finish() for output in outputs]
+
+    def search_indexed_source(self, path, searches):
+        """
+        Runs several searches against the files under the given folder, taking the hits of unchanged
+        files from the index and scanning only the files that changed since they were indexed.
+        Since every hit is processed within the file it was found in, hits are indexed per file.
+        """
+        queries = [self.index.query_key('source', search_pattern, extract_pattern,
+                                        tuple(self.grep_whitelist_patterns + white_list))
+                   for search_pattern, extract_pattern, white_list in searches]
+        if self.max_hits:
+            # Capped hits are only reused by searches with the same cap.
+            queries = [self.index.query_key(query, self.max_hits) for query in queries]
+        results = [set() for search in searches]
+        stale = []
+        reused = 0
+
+        files = self.scanner.files(path)
+        self.index.prune(path, files)
+        for source in files:
+            if self.index.check(source):
+                hits = [self.index.get(query, source) for query in queries]
+                if not None in hits:
+                    for result, found in zip(results, hits):
+                        result |= found
+                    reused += 1
                     continue
+            stale.append(source)
+
+        self.instrument.count('index files reused', reused)
+        self.instrument.count('index files rescanned', len(stale))
+        if stale:
+            found_by_search, dependencies = self.search_files(stale, searches)
+            for query, result, hits_by_file in zip(queries, results, found_by_search):
+                for source, found in hits_by_file.items():
+                    self.index.store(query, source, found)
+                    result |= found
+            for source, depends_on in dependencies.items():
+                self.index.depend(source, depends_on)
+
+        self.index.save()
+        return results
+
+    def search_files(self, files, searches):
+        """
+        Runs several searches against the given source files, sharding them across a pool of
+        worker processes if the seeker has more than one worker.
+        Returns a list holding, for each search in order, a dict mapping each file to its set of hits,
+        and a dict mapping each file to the other files its hits depend on.
+        """
+        if self.workers <= 1 or len(files) < 2:
+            return self.search_shard(files, searches)
+
+        count = min(len(files), self.workers * self.shards_per_worker)
+        tasks = [(self.scanner.name, self.classes, files[start::count], searches, self.max_hits)
+                 for start in range(count)]
+        results = [{} for search in searches]
+        dependencies = {}
+
+        self.instrument.count('worker shards', len(tasks))
+        import multiprocessing
+        pool = multiprocessing.Pool(self.workers)
+        try:
+            for shard_results, shard_dependencies in pool.imap_unordered(search_shard, tasks):
+                for result, hits_by_file in zip(results, shard_results):
+                    result.update(hits_by_file)
+                dependencies.update(shard_dependencies)
+        finally:
+            pool.close()
+            pool.join()
+        return results, dependencies
+
+    def search_shard(self, files, searches):
+        """
+        Runs several searches against a single scan of the given source files.
+        Returns a list holding, for each search in order, a dict mapping each file to its set of hits,
+        and a dict mapping each file to the other files its hits depend on.
 
-                stripped_key_and_location = self.process_key(key_and_location, white_list, search_pattern)
-                if stripped_key_and_location is not None:
-                    keys.add(stripped_key_and_location)
-        except subprocess.CalledProcessError:
-            # no hits were found
-            pass
-        return keys
+        Hits are processed within the file they were found in, including the lookups of variable
+        values and Messages objects, so each file's hits depend only on that file and on the files
+        declaring the constants it uses.
+        """
+        searched = set(files)
+        by_pattern = {}
+        for position, search in enumerate(searches):
+            by_pattern.setdefault(search[0], []).append(position)
+        outputs = {}
+        for pattern, line in self.scanner.iter_search_files(files, by_pattern.keys()):
+            source = line.split(':', 1)[0]
+            if not source in searched:
+                continue
+            for position in by_pattern[pattern]:
+                key = (position, source)
+                if not key in outputs:
+                    outputs[key] = SearchOutput(self, *searches[position])
+                outputs[key].add(line)
+
+        results = []
+        for position in range(len(searches)):
+            results.append(dict((source, outputs[(position, source)].finish() if (position, source) in outputs
+                                 else set()) for source in files))
+
+        dependencies = {}
+        if self._symbols is not None:
+            for source in files:
+                if source in self._symbols.dependencies:
+                    dependencies[source] = self._symbols.dependencies[source]
+        return results, dependencies
+
+    def process_output(self, lines, search_pattern, extract_pattern, white_list):
+        """
+        Extracts and processes the keys found in lines of scanner output for the search_pattern.
+        Lines may be any iterable, including a scanner's stream of output lines, which is closed once
+        the seeker's max_hits keys are found.
+        Returns a set of (key, location) tuples.
+        """
+        output = SearchOutput(self, search_pattern, extract_pattern, white_list)
+        try:
+            for line in lines:
+                if output.full():
+                    break
+                output.add(line)
+        finally:
+            if hasattr(lines, 'close'):
+                lines.close()
+        return output.finish()
 
     def replace_location(self, key_and_location):
 
@@ -388,15 +790,142 @@ class Seeker:
         Tests whether an output line from grep matches whitelist patterns,
         for example if it's a commented line.
         """
-        for pat in self.grep_whitelist_patterns + white_list_patterns:
-            if re.match(pat, line):
-                return True
+        matcher = self.whitelist_matcher(white_list_patterns)
+        return matcher is not None and matcher.match(line) is not None
+
+    def whitelist_matcher(self, white_list_patterns):
+        """
+        Returns a single compiled alternation of the seeker's and the given whitelist patterns,
+        or None if there are none. Built once for each list of patterns.
+        """
+        patterns = tuple(self.grep_whitelist_patterns + list(white_list_patterns))
+        if not patterns in self.whitelists:
+            if patterns:
+                self.whitelists[patterns] = AlternationMatcher(patterns)
+            else:
+                self.whitelists[patterns] = None
+        return self.whitelists[patterns]
+
+
+def search_shard(task):
+    """
+    Worker process entry point: searches a shard of source files with a new seeker using the named scanner.
+    """
+    scanner_name, classes, files, searches, max_hits = task
+    return Seeker(None, scanner_name, classes=classes, max_hits=max_hits).search_shard(files, searches)
+
+
+class SearchOutput():
+    """
+    The keys found in the scanner output of a single search, processed a line at a time as the
+    scanner finds them, so that searches sharing a scan never hold its output.
+    """
+
+    def __init__(self, seeker, search_pattern, extract_pattern, white_list):
+        self.seeker = seeker
+        self.search_pattern = search_pattern
+        self.extract_pattern = extract_pattern
+        self.white_list = white_list
+        self.whitelist = seeker.whitelist_matcher(white_list)
+        self.max_hits = seeker.max_hits
+        self.keys = set()
+        self.lines = 0
+        self.comments = 0
+        self.whitelisted = 0
+        self.processed = 0
+        self.capped = False
+
+    def full(self):
+        """
+        Returns True if the seeker's max_hits keys were found.
+        """
+        if self.max_hits and len(self.keys) >= self.max_hits:
+            if not self.capped:
+                self.capped = True
+                self.seeker.instrument.count('hit caps reached')
+            return True
         return False
 
+    def add(self, line):
+        """
+        Processes a line of scanner output, adding the keys found in it.
+        """
+        if self.capped:
+            return
+        seeker = self.seeker
+        self.lines += 1
+        # Same checks as is_valid_output, with the whitelist alternation looked up once.
+        if seeker.is_comment(line):
+            self.comments += 1
+            return
+        whitelist = self.whitelist
+        if whitelist is not None and whitelist.match(line):
+            self.whitelisted += 1
+            return
+        key_and_location = seeker.extract_pattern_and_location_from_grep(line, self.extract_pattern)
+        if key_and_location is None:
+            return
+        self.processed += 1
+
+        if seeker.is_messages_object(key_and_location[0]):
+            messages_search_pattern, messages_extract_pattern = seeker.messages_search_patterns(key_and_location[0], self.search_pattern)
+            with seeker.instrument.span('Messages', key=key_and_location[0], location=key_and_location[1]):
+                hits = seeker.search_source_for_pattern(key_and_location[1], messages_search_pattern, messages_extract_pattern, self.white_list)
+            for hit in sorted(hits):
+                if self.max_hits and len(self.keys) >= self.max_hits:
+                    break
+                self.keys.add((hit[0], key_and_location[1]))
+        else:
+            stripped_key_and_location = seeker.process_key(key_and_location, self.white_list, self.search_pattern)
+            if stripped_key_and_location is not None:
+                self.keys.add(stripped_key_and_location)
+        if self.max_hits:
+            self.full()
 
+    def finish(self):
+        """
+        Records the search's counts, and returns the set of (key, location) tuples found.
+        """
+        instrument = self.seeker.instrument
+        # Every line is checked for comments, the others against the white list, and the rest for a key.
+        checked = self.lines - self.comments
+        evaluations = self.lines + checked - self.whitelisted
+        if self.whitelist is not None:
+            evaluations += checked
+        instrument.count('lines processed', self.lines)
+        instrument.count('regex evaluations', evaluations)
+        instrument.count('keys processed', self.processed)
+        return self.keys
+
+
+class AlternationMatcher():
+    """
+    Matches a line against any of several patterns with a single compiled alternation.
+    Patterns that can't be joined without changing their meaning, as when they hold backreferences
+    or inline flags, are matched one by one.
+    """
+    unjoinable_matcher = re.compile(r'\\[1-9]|\(\?P=|\(\?[iLmsux]+\)')
 
+    def __init__(self, patterns):
+        if len(patterns) > 1 and not any(self.unjoinable_matcher.search(pattern) for pattern in patterns):
+            self.matchers = [re.compile('|'.join('(?:{0})'.format(pattern) for pattern in patterns))]
+        else:
+            self.matchers = [re.compile(pattern) for pattern in patterns]
 
+    def match(self, line):
+        for matcher in self.matchers:
+            match = matcher.match(line)
+            if match is not None:
+                return match
+        return None
 
 
+# Compiled patterns, for patterns built at runtime from container properties.
+_compiled = OrderedDict()
 
 
+def compiled(pattern):
+    """
+    Returns the compiled regex for the given pattern, compiling it only once while it is cached.
+    """
+    return compile_cached(_compiled, pattern)
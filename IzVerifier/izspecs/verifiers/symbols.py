@@ -0,0 +1,201 @@
+import hashlib
+import os
+import re
+
+__author__ = 'fcanas'
+
+
+class SymbolIndex():
+    """
+    Project-wide index of custom classes, used to resolve String constants declared in other
+    source files: qualified references such as Constants.FOO, statically imported names, and
+    names inherited from the class's supertypes, as in constants interfaces.
+
+    Classes are found through the IzClasses map of class ids to source files, and class names
+    are resolved through each file's imports, its package, and fully qualified names. The
+    constants of each file come from the seeker's per-file String constants tables.
+
+    Every file consulted while resolving a constant referenced from a source file is recorded as
+    one of that file's dependencies, so indexed hits can be invalidated when a dependency changes.
+    So is the map of custom classes itself, as a reference that can't be resolved may resolve to a
+    class added later.
+    """
+
+    # Name of the dependency on the map of custom classes.
+    classes_dependency = '<custom classes>'
+
+    import_search_pattern = '^\s*import\s'
+    import_matcher = re.compile('^\s*import\s+(static\s+)?([\w\.]+?)(\.\*)?\s*;')
+    package_search_pattern = '^\s*package\s'
+    package_matcher = re.compile('^\s*package\s+([\w\.]+)\s*;')
+    supertypes_search_pattern = '\\b(extends|implements)\\b'
+    supertypes_matcher = re.compile('\\b(?:extends|implements)\s+([\w\.]+(?:\s*,\s*[\w\.]+)*)')
+
+    def __init__(self, seeker, classes):
+        """
+        Seeker is the Seeker whose scanner and constants tables are used.
+        Classes is a map of class ids to the paths of their source files, as held by IzClasses.
+        """
+        self.seeker = seeker
+        self.classes = {}
+        self.class_ids = {}
+        for class_id, path in classes.items():
+            class_id = class_id.strip('.')
+            self.classes[class_id] = path
+            self.class_ids[path] = class_id
+        self.files = {}
+        self.dependencies = {}
+        self._digest = None
+
+    def digest(self):
+        """
+        Returns the digest of the map of custom classes.
+        """
+        if self._digest is None:
+            self._digest = hashlib.sha1(repr(sorted(self.classes.items()))).hexdigest()
+        return self._digest
+
+    def resolve_qualified(self, key, location, white_list):
+        """
+        Resolves a qualified reference such as Constants.FOO or com.sample.Constants.FOO found in
+        the file at location. Returns the constant's value, or None.
+        """
+        if not '.' in key:
+            return None
+        self.dependencies.setdefault(location, set()).add(self.classes_dependency)
+        class_name, name = key.rsplit('.', 1)
+        path = self.resolve_class(class_name, location)
+        if path is None:
+            return None
+        return self.constant_value(path, name, location, white_list)
+
+    def resolve_name(self, name, location, white_list):
+        """
+        Resolves a bare name found in the file at location, through the file's static imports and
+        its supertypes. Returns the constant's value, or None.
+        """
+        self.dependencies.setdefault(location, set()).add(self.classes_dependency)
+        symbols = self.file_symbols(location)
+
+        if name in symbols['static']:
+            path = self.resolve_class(symbols['static'][name], location)
+            if path is not None:
+                value = self.constant_value(path, name, location, white_list)
+                if value is not None:
+                    return value
+
+        for class_name in symbols['static_wildcards']:
+            path = self.resolve_class(class_name, location)
+            if path is not None:
+                value = self.constant_value(path, name, location, white_list)
+                if value is not None:
+                    return value
+
+        return self.resolve_inherited(name, location, location, white_list, set())
+
+    def resolve_inherited(self, name, path, location, white_list, visited):
+        """
+        Resolves a bare name through the supertypes of the class in the file at path, and theirs.
+        """
+        visited.add(path)
+        for class_name in self.file_symbols(path)['supertypes']:
+            supertype = self.resolve_class(class_name, path)
+            if supertype is None or supertype in visited:
+                continue
+            value = self.constant_value(supertype, name, location, white_list)
+            if value is None:
+                value = self.resolve_inherited(name, supertype, location, white_list, visited)
+            if value is not None:
+                return value
+        return None
+
+    def resolve_class(self, class_name, location):
+        """
+        Returns the path to the source file of the class with the given name, as seen from
+        the file at location, or None if it isn't a custom class.
+        """
+        if class_name in self.classes:
+            return self.classes[class_name]
+
+        symbols = self.file_symbols(location)
+        candidates = []
+        if class_name in symbols['imports']:
+            candidates.append(symbols['imports'][class_name])
+        if symbols['package']:
+            candidates.append(symbols['package'] + '.' + class_name)
+        candidates.extend(package + '.' + class_name for package in symbols['wildcards'])
+
+        for candidate in candidates:
+            if candidate in self.classes:
+                return self.classes[candidate]
+        return None
+
+    def constant_value(self, path, name, location, white_list):
+        """
+        Returns the value of the String constant with the given name declared in the file at path,
+        recording it as a dependency of the file at location.
+        """
+        self.dependencies.setdefault(location, set()).add(path)
+        hits = self.seeker.string_constants(path, white_list).get(name)
+        if hits:
+            return list(hits)[0][0]
+        return None
+
+    def file_symbols(self, path):
+        """
+        Returns the package, imports and supertypes of the source file at path, in the form:
+        {
+            'package': package name, or the package of its class id, or None,
+            'imports': {simple class name: imported class name},
+            'wildcards': [imported packages],
+            'static': {statically imported name: class name},
+            'static_wildcards': [classes whose members are all statically imported],
+            'supertypes': [names of extended classes and implemented interfaces]
+        }
+        """
+        if not path in self.files:
+            symbols = {
+                'package': None,
+                'imports': {},
+                'wildcards': [],
+                'static': {},
+                'static_wildcards': [],
+                'supertypes': []
+            }
+
+            if os.path.isfile(path):
+                self.parse_symbols(path, symbols)
+            self.files[path] = symbols
+        return self.files[path]
+
+    def parse_symbols(self, path, symbols):
+        """
+        Fills in the symbols of the source file at path.
+        """
+        scanner = self.seeker.scanner
+        for line in scanner.search(path, self.import_search_pattern):
+            match = self.import_matcher.match(line)
+            if not match:
+                continue
+            static, name, wildcard = match.groups()
+            if static and wildcard:
+                symbols['static_wildcards'].append(name)
+            elif static and '.' in name:
+                class_name, member = name.rsplit('.', 1)
+                symbols['static'][member] = class_name
+            elif wildcard:
+                symbols['wildcards'].append(name)
+            else:
+                symbols['imports'][name.rsplit('.', 1)[-1]] = name
+
+        for line in scanner.search(path, self.package_search_pattern):
+            match = self.package_matcher.match(line)
+            if match:
+                symbols['package'] = match.group(1)
+                break
+        if symbols['package'] is None and path in self.class_ids and '.' in self.class_ids[path]:
+            symbols['package'] = self.class_ids[path].rsplit('.', 1)[0]
+
+        for line in scanner.search(path, self.supertypes_search_pattern):
+            for match in self.supertypes_matcher.finditer(line):
+                symbols['supertypes'].extend(name.strip() for name in match.group(1).split(','))
@@ -1,18 +1,35 @@
-from Queue import Queue
 import importlib
+import os
 from IzVerifier.izspecs.containers.izclasses import IzClasses
+from IzVerifier.izspecs.containers.izconditions import IzConditions
+from IzVerifier.izspecs.containers.izstrings import IzStrings
+from IzVerifier.izspecs.containers.izvariables import IzVariables
 
 from IzVerifier.izspecs.izproperties import IzProperties
 from IzVerifier.izspecs.verifiers.dependencies import ConditionDependencyGraph
+from IzVerifier.izspecs.verifiers.impact import ImpactIndex
+from IzVerifier.izspecs.verifiers.imports import ImportGraph
 from IzVerifier.izspecs.verifiers.seeker import Seeker
+from IzVerifier.izspecs.verifiers.index import ReferenceIndex
+from IzVerifier.izspecs.verifiers.scanner import walk_files
 from IzVerifier.izspecs.containers.constants import *
 from IzVerifier.exceptions.IzVerifierException import IzArgumentsException
 from IzVerifier.izspecs.izpaths import IzPaths
+from IzVerifier.izspecs.izdocuments import IzDocuments
 from IzVerifier.logging.reporter import Reporter
+from IzVerifier.logging.instrumentation import Instrumentation, TraceWriter, NULL_INSTRUMENTATION
 
 
 __author__ = 'fcanas'
 
+# Container classes of the specs IzVerifier knows of. Containers of other specs are looked up by module name,
+# as IzVerifier.izspecs.containers.iz<spec>.Iz<Spec>, and registered here the first time they are used.
+CONTAINERS = {
+    'conditions': IzConditions,
+    'variables': IzVariables,
+    'strings': IzStrings
+}
+
 
 class IzVerifier():
     """
@@ -30,49 +47,187 @@ class IzVerifier():
             'resources_path': path              # Path to root resources folder for installer.
             'pom': path                         # Path to pom file, if used for properties.
             'sources': [path1, path2, ...]      # Path(s) to associated source code roots.
+            'scanner': name                     # Optional source scanning backend: 'python' (the default), 'grep',
+                                                # 'ripgrep', or 'auto' for ripgrep if rg is installed, else 'python'.
+            'parser': 'soup' or 'iterparse'     # Optional xml parser for spec files, defaults to 'soup'.
+            'index': path or True               # Optional path to an index file of references, kept
+                                                # between runs so only changed files are searched again.
+                                                # True keeps the index in memory only, for long-lived verifiers.
+            'workers': count                    # Optional number of processes to search source code with, defaults to 1.
+            'max_hits': count                   # Optional cap on the hits kept for each pattern searched in a source path.
+            'instrument': True or False         # Optional, records the time of each phase and counts key events.
+            'callbacks': [fn1, fn2, ...]        # Optional instrumentation callbacks, called with (event, name, value).
+            'trace': path                       # Optional path to write a trace-event JSON file of the run to,
+                                                # for chrome://tracing or Perfetto.
         }
         """
         _validate_arguments(args)
+        self.args = args
         self.reporter = Reporter()
         self.specifications = ['conditions', 'variables', 'strings']
-        self.containers = {}
         self.sources = args.get('sources', [])
+        if args.get('instrument') or args.get('callbacks') or args.get('trace'):
+            trace = None
+            if args.get('trace'):
+                trace = TraceWriter(args['trace'])
+            self.instrumentation = Instrumentation(args.get('callbacks'), trace)
+        else:
+            self.instrumentation = NULL_INSTRUMENTATION
+        self.documents = IzDocuments(args.get('parser', 'soup'), self.instrumentation)
 
-        if 'pom' in args:
-            self.properties = IzProperties(args['pom'])
+        if 'index' in args:
+            self.index = ReferenceIndex(None if args['index'] is True else args['index'])
         else:
-            self.properties = None
-        self.paths = IzPaths(args['specs_path'], args['resources_path'], self.properties)
-        self._fill_classes()
-        self.seeker = Seeker(self.paths)
-        self.referenced_classes = self._find_all_referenced_classes()
+            self.index = None
+        self.snapshot = None
+        self._reset()
+
+    def _reset(self):
+        """
+        Drops the installer's paths, containers, class map and referenced classes, so they are parsed
+        again when next used. Nothing is parsed until then.
+        """
+        self.containers = {}
+        self.impact_index = None
+        self.properties = None
+        self._paths = None
+        self._seeker = None
+        self._referenced_classes = None
+
+    @property
+    def paths(self):
+        """
+        The installer's IzPaths, parsed from the pom, install.xml and its resources on first use.
+        """
+        if self._paths is None:
+            if 'pom' in self.args:
+                self.properties = IzProperties(self.args['pom'])
+            with self.instrumentation.phase('paths'):
+                self._paths = IzPaths(self.args['specs_path'], self.args['resources_path'], self.properties,
+                                      self.documents)
+        return self._paths
+
+    @property
+    def seeker(self):
+        """
+        The Seeker searching the installer's specs and source code, created on first use.
+        """
+        if self._seeker is None:
+            args = self.args
+            self._seeker = Seeker(self.paths, args.get('scanner'), self.documents, self.index, args.get('workers', 1),
+                                  self._class_map, self.instrumentation, args.get('max_hits'))
+        return self._seeker
+
+    @property
+    def referenced_classes(self):
+        """
+        The set of paths of the source files of classes used by the installer, found on first use.
+        """
+        if self._referenced_classes is None:
+            with self.instrumentation.phase('referenced classes'):
+                self._referenced_classes = self._find_all_referenced_classes()
+        return self._referenced_classes
+
+    def refresh(self):
+        """
+        Brings a long-lived verifier up to date with the files on disk, reloading only what depends on
+        files changed since the last refresh:
+
+        install.xml, resources.xml or the pom: everything is parsed again.
+        Any other spec, resource or langpack file: only the containers parsed from it are dropped, to be
+        parsed again when next used.
+        Any source file: the classes are parsed again, and only the changed files are read again.
+        Referenced classes are found again when next used.
+
+        Spec files searched for references are parsed again as they change, whether or not the verifier
+        is refreshed. The first refresh only records the state of the files.
+        Returns the set of paths of the files changed since the last refresh.
+        """
+        with self.instrumentation.phase('refresh'):
+            previous = self.snapshot
+            specs, sources = self._snapshot()
+            self.snapshot = (specs, sources)
+            if previous is None:
+                return set()
+
+            changed = _changed(previous[0], specs)
+            sources_changed = _changed(previous[1], sources)
+            if not changed and not sources_changed:
+                return set()
+
+            layout = set([self.args.get('pom'), self.paths.get_path('install'), self.paths.get_path('resources')])
+            if changed & layout:
+                self._reset()
+                self.snapshot = self._snapshot()
+                return changed | sources_changed
+
+            for specification in self.containers.keys():
+                if specification != 'classes' and self.paths.get_path(specification) in changed:
+                    del self.containers[specification]
+            self.impact_index = None
+            self._referenced_classes = None
+            if sources_changed:
+                if 'classes' in self.containers:
+                    with self.instrumentation.phase('classes'):
+                        self._fill_classes()
+                if self._seeker is not None:
+                    self._seeker.forget(sources_changed, self._class_map)
+            return changed | sources_changed
+
+    def _snapshot(self):
+        """
+        Returns the (size, modification time) of the installer's spec, resource and langpack files, and
+        of its source files, as two dicts keyed by path. Missing files map to None.
+        """
+        paths = set(self.paths.get_path(spec) for spec in self.paths.specs if spec != 'BASE')
+        paths |= set(self.paths.get_path(resource) for resource in self.paths.resources if resource != 'BASE')
+        paths |= set(self.paths.get_langpack_path(lid) for lid in self.paths.get_langpacks())
+        if self.args.get('pom'):
+            paths.add(self.args['pom'])
+        sources = set()
+        for root in self.sources:
+            if os.path.isdir(root):
+                sources.update(walk_files(root))
+            else:
+                sources.add(root)
+        return _stats(paths), _stats(sources)
 
     def verify_all(self, verbosity=0, filter_classes=False):
         """
         Runs a verification for all specs.
+        Source code is scanned once for the patterns of every spec.
         """
-        missing = set([])
+        with self.instrumentation.phase('verify'):
+            missing = set([])
+            crefs = self.find_code_references_many(self.specifications)
 
-        for specification in self.specifications:
-            missing |= self.verify(specification, verbosity, filter_classes)
+            for specification in self.specifications:
+                missing |= self._verify(specification, crefs[specification], verbosity, filter_classes)
         return missing
 
     def verify(self, specification, verbosity=0, filter_classes=False):
         """
         Runs a verification on the given izpack spec: conditions, strings, variables, etc.
         """
+        with self.instrumentation.phase('verify'):
+            crefs = self.find_code_references(specification)
+            return self._verify(specification, crefs, verbosity, filter_classes)
 
-        container = self.get_container(specification)
-        defined = container.get_keys()
-        crefs = self.find_code_references(specification)
-        srefs = self.find_specification_references(specification)
+    def _verify(self, specification, crefs, verbosity=0, filter_classes=False):
+        """
+        Runs a verification on the given izpack spec, given the references already found for it in source code.
+        """
+        with self.instrumentation.span('verify({0})'.format(specification)):
+            container = self.get_container(specification)
+            defined = container.get_keys()
+            srefs = self.find_specification_references(specification)
 
-        self._load_references(crefs | srefs, container)
+            self._load_references(crefs | srefs, container)
 
-        cmissing = _undefined(defined, crefs)
-        if (filter_classes):
-            cmissing = self.filter_unused_classes(self.referenced_classes, cmissing)
-        smissing = _undefined(defined, srefs)
+            cmissing = _undefined(defined, crefs)
+            if (filter_classes):
+                cmissing = self.filter_unused_classes(self.referenced_classes, cmissing)
+            smissing = _undefined(defined, srefs)
 
         if verbosity > 0:
             self.reporter.report_test('undefined {0} referenced in code'.format(specification), cmissing)
@@ -84,10 +239,12 @@ class IzVerifier():
         """
         Run a conditions dependency graph search.
         """
-        graph = ConditionDependencyGraph(self, fail_on_undefined_vars, filter_classes)
+        with self.instrumentation.phase('dependency verification'):
+            graph = ConditionDependencyGraph(self, fail_on_undefined_vars, filter_classes)
 
-        results = graph.test_verify_all_dependencies()
+            results = graph.test_verify_all_dependencies()
         if verbosity > 0:
+            self.reporter.report_test('condition cycles', set(', '.join(cycle) for cycle in graph.graph.cycles()))
             self.reporter.display_paths(results)
         return results
 
@@ -97,6 +254,10 @@ class IzVerifier():
         specified in the constructor.
         """
         if not specification in self.containers:
+            if specification == 'classes':
+                with self.instrumentation.phase('classes'):
+                    self._fill_classes()
+                return self.containers['classes']
             return self._init_container(specification)
         else:
             return self.containers[specification]
@@ -105,9 +266,9 @@ class IzVerifier():
         """
         Initialize a container to be used for verification.
         """
-        module = importlib.import_module("IzVerifier.izspecs.containers.iz" + specification)
-        class_ = getattr(module, 'Iz' + specification.title())
-        instance = class_(self.paths.get_path(specification))
+        class_ = _container_class(specification)
+        with self.instrumentation.phase('container parsing'):
+            instance = class_(self.paths.get_path(specification), self.documents)
         self.containers[specification] = instance
         return instance
 
@@ -123,6 +284,19 @@ class IzVerifier():
 
         return hits
 
+    def find_code_references_many(self, specifications):
+        """
+        Find all source code references for several specs with a single scan of each source root.
+        Returns a dict mapping each specification to its set of references.
+        :param specifications: list of conditions, variables, strings, or other izpack specs
+        """
+        searches = {}
+        for specification in specifications:
+            container = self.get_container(specification)
+            searches[specification] = (container.properties[PATTERNS], container.properties[WHITE_LIST_PATTERNS])
+
+        return self.seeker.find_references_in_source_many(searches, self.sources)
+
     def find_specification_references(self, specification):
         """
         Find all specification xml references for specs in each container.
@@ -135,7 +309,8 @@ class IzVerifier():
             'filter_fn': container.has_reference,
             'attributes': container.properties[ATTRIBUTES],
             'transform_fn': container.ref_transformer,
-            'white_list_patterns': container.properties[WHITE_LIST_PATTERNS]
+            'white_list_patterns': container.properties[WHITE_LIST_PATTERNS],
+            'index_key': specification
         }
         hits = self.seeker.search_specs_for_attributes(args)
         return hits
@@ -177,12 +352,82 @@ class IzVerifier():
             self.reporter.report_test('references to {0} in {1}'.format(rid, specification), results)
         return results
 
+    def find_references_many(self, ids, specs=None, verbosity=0):
+        """
+        Finds all references to each of the given ids in source code and spec files for any of the given specs,
+        with a single search of the spec files and a single scan of the source code per spec.
+        Returns a dict mapping each id to the set of references find_references returns for it.
+        """
+        results = dict((rid, set()) for rid in ids)
+
+        if not specs:
+            specs = self.specifications
+
+        for specification in specs:
+            container = self.get_container(specification)
+            props = {
+                'path': self.paths.root,
+                'ids': list(ids),
+                'specs': map(self.paths.get_path, container.properties[REFERENCE_SPEC_FILES]),
+                'filter_fn': container.has_reference,
+                'attributes': container.properties[ATTRIBUTES],
+                'patterns': container.properties[PATTERNS],
+                'source_paths': self.sources,
+                'white_list_patterns': container.properties[WHITE_LIST_PATTERNS],
+                'index_key': 'references:' + specification
+            }
+            for rid, hits in self.seeker.find_id_references_many(props).items():
+                results[rid] |= hits
+
+        if verbosity > 0:
+            for rid in sorted(results):
+                self.reporter.report_test('references to {0}'.format(rid), results[rid])
+        return results
+
+    def impact(self, rid, specification=None, verbosity=0):
+        """
+        Finds everything that would be affected by removing or renaming the condition or variable with
+        the given id: the conditions that depend on it, directly or transitively, and the references to
+        it and to those conditions in specs and source code. Returns them in the form:
+        {
+            'conditions': set(condition ids),
+            'references': set((id, location), ...)
+        }
+        Specification restricts the id to 'conditions' or 'variables'; by default it is looked up as both.
+        The reverse-dependency index is built on the first query, and reused for later ones.
+        """
+        if specification:
+            kinds = [specification]
+        else:
+            kinds = None
+        results = self.get_impact_index().impact(rid, kinds)
+
+        if verbosity > 0:
+            self.reporter.report_test('conditions depending on {0}'.format(rid), results['conditions'])
+            self.reporter.report_test('references impacted by {0}'.format(rid), results['references'])
+        return results
+
+    def get_impact_index(self):
+        """
+        Returns the reverse-dependency index of conditions and variables, building it if needed.
+        """
+        if self.impact_index is None:
+            with self.instrumentation.phase('impact index'):
+                kinds = ImpactIndex.kinds
+                references = self.find_code_references_many(kinds)
+                for kind in kinds:
+                    references[kind] |= self.find_specification_references(kind)
+                self.impact_index = ImpactIndex(self.get_container('conditions'), references)
+        return self.impact_index
+
     @staticmethod
     def _load_references(references, container):
         """
         Load a container's referenced map with all detected references from source code and spec files.
+        The map is rebuilt on every verification, so references removed from changed files are dropped.
         """
         referenced = container.get_referenced()
+        referenced.clear()
         for ref in references:
             if ref[0] in referenced:
                 referenced[ref[0]].add(ref[1])
@@ -193,12 +438,18 @@ class IzVerifier():
         """
         Initialize a container to be used for verification.
         """
-        module = importlib.import_module("IzVerifier.izspecs.containers.iz" + specification)
-        class_ = getattr(module, 'Iz' + specification.title())
-        instance = class_(self.paths.get_path(specification))
+        class_ = _container_class(specification)
+        with self.instrumentation.phase('container parsing'):
+            instance = class_(self.paths.get_path(specification), self.documents)
         self.containers[specification] = instance
         return instance
 
+    def _class_map(self):
+        """
+        Returns the map of custom class ids to their source files, parsing the classes container on first use.
+        """
+        return self.get_container('classes').container
+
     def _fill_classes(self):
         """
         Fills a 'classes container' with custom class info from source code paths.
@@ -209,6 +460,18 @@ class IzVerifier():
             container.parse(path)
         self.containers['classes'] = container
 
+    def get_instrumentation(self):
+        """
+        Returns the time recorded for each phase and the counts of key events, if instrumentation
+        is enabled, in the form:
+        {
+            'phases': {name: {'calls': count, 'time': seconds}, ...},
+            'counters': {name: count, ...}
+        }
+        Phases nest, so their times are inclusive.
+        """
+        return self.instrumentation.results()
+
     def get_referenced(self, specification):
         """
         Return a specification's map of id's to references.
@@ -218,36 +481,15 @@ class IzVerifier():
     def _find_all_referenced_classes(self):
         """
         Return a set of containing the list of classes that were listed in the specification files,
-        ano those that were imported by those listed in the specification files.
+        and those that they import or refer to, directly or transitively.
+        The import graph of all custom classes is built with a single search of their files, then
+        traversed once from all of the classes listed in the specification files.
         """
-
-        referenced_classes = set()
-        searched_classes = set()
-
-        search_pattern = "import\s+.+;"
-        extract_pattern = "import\s+([^;]+)"
-        white_list = ["^import\s+com.izforge.izpack.*;$", "^import\s+java.*;$"]
-
-        izclass_container = self.get_container("classes")
-        class_to_path_map = izclass_container.container
-        classes_referenced_in_specs, spec_found_in = zip(*self.find_specification_references("classes"))
-
-        for reffed_class in classes_referenced_in_specs:
-            queue = Queue()
-            queue.put(reffed_class)
-            while (not queue.empty()):
-                search_class = queue.get()
-                searched_classes.add(search_class)
-                if not search_class in class_to_path_map:
-                    continue
-                referenced_classes.add(class_to_path_map[search_class])
-                found_imports = self.seeker.search_source_for_pattern(class_to_path_map[search_class], search_pattern, extract_pattern, white_list)
-                for found_import in found_imports:
-                    if (found_import[0] in searched_classes):
-                        continue
-                    queue.put(found_import[0])
-
-        return referenced_classes & set(class_to_path_map.values())
+        class_to_path_map = self.get_container("classes").container
+        graph = ImportGraph(class_to_path_map, self.seeker.scanner)
+        classes_referenced_in_specs = set(ref[0] for ref in self.find_specification_references("classes"))
+        return graph.reachable(class_to_path_map[reffed_class] for reffed_class in classes_referenced_in_specs
+                               if reffed_class in class_to_path_map)
 
     def filter_unused_classes(self, class_set, tup_set):
         """
@@ -259,6 +501,16 @@ class IzVerifier():
 
 
 
+def _container_class(specification):
+    """
+    Returns the container class of the given spec, from the registry of containers.
+    """
+    if not specification in CONTAINERS:
+        module = importlib.import_module("IzVerifier.izspecs.containers.iz" + specification)
+        CONTAINERS[specification] = getattr(module, 'Iz' + specification.title())
+    return CONTAINERS[specification]
+
+
 def _validate_arguments(args):
     """
     Throws exceptions if required args are missing or invalid.
@@ -267,6 +519,29 @@ def _validate_arguments(args):
         raise IzArgumentsException("No Path to Installer Specs Specified")
     if not 'resources_path' in args:
         raise IzArgumentsException("No Path to Installer Resources Specified")
+    if 'workers' in args and (not isinstance(args['workers'], int) or args['workers'] < 1):
+        raise IzArgumentsException("Invalid Number of Workers: " + str(args['workers']))
+
+
+def _stats(paths):
+    """
+    Returns a dict mapping each path to the (size, modification time) of its file, or None if it is missing.
+    """
+    stats = {}
+    for path in paths:
+        try:
+            stat = os.stat(path)
+            stats[path] = (stat.st_size, stat.st_mtime)
+        except (OSError, TypeError):
+            stats[path] = None
+    return stats
+
+
+def _changed(before, after):
+    """
+    Returns the set of paths whose stats differ between two dicts returned by _stats.
+    """
+    return set(path for path in set(before) | set(after) if before.get(path) != after.get(path))
 
 
 def _undefined(key_set, tup_set):
@@ -0,0 +1,219 @@
+import atexit
+import json
+import os
+import thread
+import time
+
+__author__ = 'fcanas'
+
+
+class Instrumentation():
+    """
+    Records the wall time spent in each phase of a run and counts key events: subprocesses spawned,
+    files read, xml documents parsed, regex evaluations, cache hits, etc.
+
+    Phases may nest, so each phase's time includes the time of the phases run within it.
+    Callbacks are called with (event, name, value) as events happen: ('phase', name, seconds) when
+    a phase ends, and ('count', name, amount) when an event is counted.
+
+    If a TraceWriter is given, every phase and every span (a single timed call, such as one spec
+    parse or one condition visit) is also written to it as a trace event.
+    """
+
+    enabled = True
+
+    def __init__(self, callbacks=None, trace=None):
+        self.phases = {}
+        self.counters = {}
+        self.callbacks = list(callbacks or [])
+        self.trace = trace
+        self.depth = 0
+
+    def phase(self, name):
+        """
+        Returns a context manager timing the named phase:
+
+        with instrumentation.phase('parse'):
+            ...
+        """
+        return Phase(self, name, 'phase')
+
+    def span(self, name, **args):
+        """
+        Returns a context manager tracing a single call as a span with the given name and arguments.
+        Spans are only traced, not aggregated, and cost nothing when there is no trace.
+        """
+        if self.trace is None:
+            return NULL_PHASE
+        return Phase(self, name, 'span', args)
+
+    def record_span(self, name, start, **args):
+        """
+        Traces a span that started at start, a time.time() value, and ends now. For code that can't
+        wrap the span in a with statement.
+        """
+        if self.trace is not None:
+            self.trace.complete(name, 'span', start, time.time() - start, args)
+
+    def record(self, name, elapsed):
+        """
+        Records a run of the named phase that took elapsed seconds.
+        """
+        if name in self.phases:
+            self.phases[name]['calls'] += 1
+            self.phases[name]['time'] += elapsed
+        else:
+            self.phases[name] = {'calls': 1, 'time': elapsed}
+        for callback in self.callbacks:
+            callback('phase', name, elapsed)
+
+    def count(self, name, amount=1):
+        """
+        Adds amount to the named counter.
+        """
+        self.counters[name] = self.counters.get(name, 0) + amount
+        for callback in self.callbacks:
+            callback('count', name, amount)
+
+    def results(self):
+        """
+        Returns the recorded phases and counters in the form:
+        {
+            'phases': {name: {'calls': count, 'time': seconds}, ...},
+            'counters': {name: count, ...}
+        }
+        """
+        return {
+            'phases': dict((name, dict(phase)) for name, phase in self.phases.items()),
+            'counters': dict(self.counters)
+        }
+
+
+class Phase(object):
+    """
+    Context manager timing a single run of a phase, or a single span.
+    """
+    __slots__ = ('instrumentation', 'name', 'category', 'args', 'start')
+
+    def __init__(self, instrumentation, name, category, args=None):
+        self.instrumentation = instrumentation
+        self.name = name
+        self.category = category
+        self.args = args
+
+    def __enter__(self):
+        self.instrumentation.depth += 1
+        self.start = time.time()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        elapsed = time.time() - self.start
+        instrumentation = self.instrumentation
+        instrumentation.depth -= 1
+        if self.category == 'phase':
+            instrumentation.record(self.name, elapsed)
+
+        trace = instrumentation.trace
+        if trace is not None:
+            trace.complete(self.name, self.category, self.start, elapsed, self.args)
+            if instrumentation.depth == 0:
+                trace.flush()
+        return False
+
+
+class TraceWriter():
+    """
+    Writes trace events to a file in the Trace Event Format's JSON array form, which can be loaded
+    into chrome://tracing or Perfetto. Each span is written as a complete ('X') event when it ends.
+
+    The closing bracket is written when the writer is closed, or at exit; viewers also load files
+    whose array was left open.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.file = open(path, 'w')
+        self.file.write('[')
+        self.first = True
+        self.pid = os.getpid()
+        atexit.register(self.close)
+
+    def complete(self, name, category, start, elapsed, args=None):
+        """
+        Writes a complete event for a span that started at start and lasted elapsed seconds.
+        """
+        if self.file is None:
+            return
+        event = {
+            'name': name,
+            'cat': category,
+            'ph': 'X',
+            'ts': int(start * 1000000),
+            'dur': int(elapsed * 1000000),
+            'pid': self.pid,
+            'tid': thread.get_ident()
+        }
+        if args:
+            event['args'] = args
+        if self.first:
+            self.first = False
+        else:
+            self.file.write(',')
+        self.file.write('\n' + json.dumps(event, default=str))
+
+    def flush(self):
+        if self.file is not None:
+            self.file.flush()
+
+    def close(self):
+        """
+        Terminates the array of events and closes the file.
+        """
+        if self.file is not None:
+            self.file.write('\n]\n')
+            self.file.close()
+            self.file = None
+
+
+class NullInstrumentation():
+    """
+    Instrumentation that records nothing, used when instrumentation is disabled.
+    """
+
+    enabled = False
+    trace = None
+
+    def phase(self, name):
+        return NULL_PHASE
+
+    def span(self, name, **args):
+        return NULL_PHASE
+
+    def record_span(self, name, start, **args):
+        pass
+
+    def record(self, name, elapsed):
+        pass
+
+    def count(self, name, amount=1):
+        pass
+
+    def results(self):
+        return {'phases': {}, 'counters': {}}
+
+
+class NullPhase(object):
+    """
+    Context manager that times nothing.
+    """
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        return False
+
+
+NULL_PHASE = NullPhase()
+NULL_INSTRUMENTATION = NullInstrumentation()
@@ -80,35 +80,74 @@ class Reporter:
     def display_paths(self, paths_dict):
         """
         Human readable output for displaying dependency paths.
+        The paths of each condition are displayed as a tree, so steps common to several paths are displayed
+        once. Steps shared by several branches, such as a condition many others depend on, are only followed
+        the first time they are displayed. Paths may be sets of path tuples, or hold their tree of steps
+        already, as FailurePaths do.
         """
         def node_type(node):
             return " (type: {0})".format(str(node[1]))
 
+        def element_id(node):
+            if type(node[0]) is tuple:
+                return node[0][0]
+            return node[0]
+
+        def following(step):
+            return sorted(step.children.values(), key=lambda child: child.element, reverse=True)
+
         template = self.templates['path_display']
 
         for condition_id in paths_dict:
-            for path_index, path in enumerate(list(paths_dict[condition_id])):
-                tab = len(condition_id)
-                for node_index, node in enumerate(path):
-                    if node_index == 0:
-                        if path_index == 0:
-                            print template.format(condition_id + node_type(node), self.width - len('[ FAIL ]'))
-                        else:
-                            continue
+            paths = paths_dict[condition_id]
+            if hasattr(paths, 'roots'):
+                roots = paths.roots
+            else:
+                roots = path_tree(paths)
+
+            displayed = set()
+            for root in sorted(roots, key=lambda step: step.element):
+                print template.format(condition_id + node_type(root.element), self.width - len('[ FAIL ]'))
+                stack = [(step, len(condition_id)) for step in following(root)]
+                while stack:
+                    step, tab = stack.pop()
+                    cid = element_id(step.element)
+                    if tab:
+                        branch = '\--> depends on '
                     else:
-                        add_to_tab = 0
-                        if type(node[0]) is tuple:
-                            cid = node[0][0]
-                            add_to_tab += len(cid)
-                        else:
-                            cid = node[0]
-                            add_to_tab += len(cid)
-                        if tab:
-                            branch = '\--> depends on '
-                            add_to_tab += len(branch)
-                        else:
-                            branch = ''
-
-                        print " " * tab + branch + str(cid) + node_type(node)
-                        tab += add_to_tab
-            print
\ No newline at end of file
+                        branch = ''
+
+                    line = " " * tab + branch + str(cid) + node_type(step.element)
+                    if step.children and id(step) in displayed:
+                        print line + ' (see above)'
+                        continue
+                    print line
+                    displayed.add(id(step))
+                    stack.extend((child, tab + len(cid) + len(branch)) for child in following(step))
+            print
+
+
+class PathStep():
+    """
+    A step of the paths displayed by Reporter.display_paths, with the steps following it by element.
+    """
+
+    def __init__(self, element):
+        self.element = element
+        self.children = {}
+
+
+def path_tree(paths):
+    """
+    Returns the first steps of the given path tuples, with the steps common to several paths merged.
+    """
+    roots = {}
+    for path in paths:
+        if not path[0] in roots:
+            roots[path[0]] = PathStep(path[0])
+        step = roots[path[0]]
+        for element in path[1:]:
+            if not element in step.children:
+                step.children[element] = PathStep(element)
+            step = step.children[element]
+    return roots.values()
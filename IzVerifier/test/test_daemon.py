@@ -0,0 +1,150 @@
+import os
+import shutil
+import tempfile
+import threading
+from IzVerifier.daemon import VerifierDaemon, request
+from IzVerifier.exceptions.IzVerifierException import IzVerifierException
+from IzVerifier.izverifier import IzVerifier
+
+__author__ = 'fcanas'
+
+import unittest
+
+installer = 'data/sample_installer_iz5/'
+source_path2 = 'data/sample_code_base/src/'
+
+
+class TestDaemon(unittest.TestCase):
+    """
+    Basic testing of the verification daemon and of verifier refreshes.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        shutil.copytree(installer, os.path.join(self.tmp, 'installer'))
+        shutil.copytree(source_path2, os.path.join(self.tmp, 'src'))
+        self.args = {
+            'specs_path': os.path.join(self.tmp, 'installer', 'izpack/'),
+            'resources_path': os.path.join(self.tmp, 'installer', 'resources/'),
+            'pom': os.path.join(self.tmp, 'installer', 'pom.xml'),
+            'sources': [os.path.join(self.tmp, 'src/')]
+        }
+        self.socket_path = os.path.join(self.tmp, 'izverifier.sock')
+        self.daemon = VerifierDaemon(self.args, self.socket_path)
+        self.daemon.start()
+        self.thread = threading.Thread(target=self.daemon.serve_forever)
+        self.thread.start()
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.thread.join()
+        shutil.rmtree(self.tmp)
+
+    def append_string(self, sid):
+        """
+        Defines a new string in the langpack, making sure its modification time changes.
+        """
+        path = self.daemon.verifier.paths.get_langpack_path()
+        with open(path) as f:
+            content = f.read()
+        with open(path, 'w') as f:
+            f.write(content.replace('</langpack>', '<str id="{0}" txt="New string"/>\n</langpack>'.format(sid)))
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    def test_requests(self):
+        """
+        The daemon answers requests like a fresh verifier, and reports bad requests as errors.
+        """
+        izv = IzVerifier(self.args)
+        self.assertEquals(request(self.socket_path, 'ping'), 'pong')
+        self.assertEquals(request(self.socket_path, 'verify', specification='strings'),
+                          sorted([list(hit) for hit in izv.verify('strings')]))
+        self.assertEquals(request(self.socket_path, 'find_references', rid='some.user.password'),
+                          sorted([list(hit) for hit in izv.find_references('some.user.password')]))
+        paths = request(self.socket_path, 'dependency_verification')
+        self.assertEquals(sorted(paths.keys()), sorted(izv.dependency_verification().keys()))
+
+        self.assertRaises(IzVerifierException, request, self.socket_path, 'no_such_method')
+        self.assertRaises(IzVerifierException, request, self.socket_path, 'verify', bad_param=1)
+
+    def test_indexedRequests(self):
+        """
+        A daemon with a reference index on disk serves requests from its handler threads.
+        """
+        args = dict(self.args, index=os.path.join(self.tmp, 'index.db'))
+        socket_path = os.path.join(self.tmp, 'indexed.sock')
+        daemon = VerifierDaemon(args, socket_path)
+        daemon.start()
+        thread = threading.Thread(target=daemon.serve_forever)
+        thread.start()
+        try:
+            expected = sorted([list(hit) for hit in IzVerifier(self.args).verify_all()])
+            self.assertEquals(request(socket_path, 'verify_all'), expected)
+            self.append_string('some.string.4')
+            self.assertEquals(request(socket_path, 'verify_all'),
+                              sorted([list(hit) for hit in IzVerifier(self.args).verify_all()]))
+        finally:
+            daemon.shutdown()
+            thread.join()
+
+    def test_concurrentClients(self):
+        """
+        Concurrent clients all get the same answers.
+        """
+        expected = request(self.socket_path, 'verify_all')
+        results = []
+
+        def client():
+            results.append(request(self.socket_path, 'verify_all'))
+
+        threads = [threading.Thread(target=client) for index in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEquals(results, [expected] * 8)
+
+    def test_refresh(self):
+        """
+        Only the containers of changed files are parsed again.
+        """
+        self.assertTrue(['some.string.4'] in [hit[:1] for hit in request(self.socket_path, 'verify', specification='strings')])
+        request(self.socket_path, 'verify', specification='conditions')
+        conditions = self.daemon.verifier.containers['conditions']
+
+        self.append_string('some.string.4')
+        changed = request(self.socket_path, 'refresh')
+        self.assertEquals(changed, [self.daemon.verifier.paths.get_langpack_path()])
+        self.assertFalse('strings' in self.daemon.verifier.containers)
+        self.assertTrue(self.daemon.verifier.containers['conditions'] is conditions)
+
+        hits = request(self.socket_path, 'verify', specification='strings')
+        self.assertFalse(['some.string.4'] in [hit[:1] for hit in hits])
+        self.assertEquals(request(self.socket_path, 'refresh'), [])
+
+    def test_removedReferences(self):
+        """
+        The daemon keeps an in-memory index, and drops references removed from changed source files.
+        """
+        self.assertFalse(self.daemon.verifier.index is None)
+        request(self.socket_path, 'verify', specification='strings')
+        self.assertTrue('some.string.4' in self.daemon.verifier.get_referenced('strings'))
+
+        source = os.path.join(self.tmp, 'src', 'com', 'sample', 'installer', 'Foo.java')
+        with open(source) as f:
+            content = f.read()
+        with open(source, 'w') as f:
+            f.write(content.replace('String key2 = "some.string.4";', ''))
+        stat = os.stat(source)
+        os.utime(source, (stat.st_atime, stat.st_mtime + 10))
+
+        izv = IzVerifier(self.args)
+        self.assertEquals(request(self.socket_path, 'verify', specification='strings'),
+                          sorted([list(hit) for hit in izv.verify('strings')]))
+        self.assertFalse('some.string.4' in self.daemon.verifier.get_referenced('strings'))
+        self.assertEquals(self.daemon.verifier.get_referenced('strings'), izv.get_referenced('strings'))
+
+
+if __name__ == '__main__':
+    unittest.main()
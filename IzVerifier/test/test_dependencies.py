@@ -2,6 +2,8 @@ __author__ = 'fcanas'
 
 import unittest
 
+from IzVerifier.izspecs.containers.izcontainer import SpecRecord
+from IzVerifier.izspecs.verifiers.dependencies import ConditionDependencyGraph, ConditionGraph, FailurePaths
 from IzVerifier.izverifier import IzVerifier
 
 
@@ -50,10 +52,59 @@ class TestDependencies(unittest.TestCase):
         for cond in not_found:
             print "%s was not found" % cond
 
+    def test_conditionCycles(self):
+        """
+        Each cycle of conditions is found once, as a strongly connected component, and conditions on
+        a cycle or depending on one fail with a path to it.
+        """
+        graph = ConditionDependencyGraph(self.izv)
+        cycle = ('or.cycle.1', 'or.cycle.2', 'or.cycle.3')
+        self.assertEquals(graph.graph.cycles(), [cycle])
 
+        results = graph.test_verify_all_dependencies()
+        label = (', '.join(cycle), 'condition cycle')
+        for cid in cycle:
+            self.assertEquals(results[cid], {((cid, 'condition'), label)})
 
+        paths = ConditionDependencyGraph(self.izv).verify_dependencies('short.1')
+        for cid in ['or.cycle.2', 'or.cycle.3']:
+            self.assertTrue((('short.1', 'condition'), (cid, 'condition'), label) in paths)
 
-
-
-
+    def test_deepConditions(self):
+        """
+        Conditions nested far deeper than the recursion limit are verified, and shared ill-defined
+        conditions are searched once.
+        """
+        graph = ConditionDependencyGraph(self.izv)
+        depth = 5000
+        for index in range(depth):
+            refs = ('deep.{0}'.format(index + 1), 'shared')
+            graph.conditions.container['deep.{0}'.format(index)] = SpecRecord('deep.{0}'.format(index), type='and', refs=refs)
+        graph.conditions.container['deep.{0}'.format(depth)] = SpecRecord('deep.{0}'.format(depth), type='ref')
+        graph.conditions.container['shared'] = SpecRecord('shared', type='or', refs=('and.1', 'or.cycle.1'))
+        graph.graph = ConditionGraph(graph.conditions, graph.compound_conditions)
+
+        paths = graph.verify_dependencies('deep.0')
+        shared = graph.verify_dependencies('shared')
+        self.assertTrue(isinstance(paths, FailurePaths))
+        self.assertEquals(len(paths), depth * len(shared))
+        deepest = tuple(('deep.{0}'.format(index), 'condition') for index in range(depth))
+        for path in shared:
+            self.assertTrue((('deep.0', 'condition'),) + path in paths)
+            self.assertTrue(deepest + path in paths)
+
+    def test_failurePaths(self):
+        """
+        Failure paths are stored once per step, and behave like a set of path tuples.
+        """
+        paths = {(('x', 'condition'), ('a', 'condition'), ('u', 'undefined condition')),
+                 (('x', 'condition'), ('a', 'condition'), ('v', 'undefined condition')),
+                 (('x', 'condition'), ('w', 'ill-defined condition'))}
+        failures = FailurePaths.from_paths(paths)
+        self.assertEquals(len(failures), 3)
+        self.assertEquals(failures, paths)
+        self.assertTrue((('x', 'condition'), ('w', 'ill-defined condition')) in failures)
+        self.assertFalse((('x', 'condition'), ('a', 'condition')) in failures)
+        self.assertEquals(len(failures.root().children), 2)
+        self.assertFalse(FailurePaths())
 
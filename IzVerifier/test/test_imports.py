@@ -0,0 +1,69 @@
+import os
+import shutil
+import tempfile
+from IzVerifier.izspecs.containers.izclasses import IzClasses
+from IzVerifier.izspecs.verifiers.imports import ImportGraph
+from IzVerifier.izspecs.verifiers.scanner import get_scanner
+
+__author__ = 'fcanas'
+
+import unittest
+
+sources = {
+    'com/app/Main.java': ['package com.app;',
+                          'import com.app.util.*;',
+                          'import static com.app.consts.Keys.NAME;',
+                          'public class Main extends Base {',
+                          '    Helper helper = new Helper();',
+                          '    Object o = com.app.other.Qualified.Inner.VALUE;',
+                          '}'],
+    'com/app/Base.java': ['package com.app;', 'public class Base {}'],
+    'com/app/Unused.java': ['package com.app;', 'public class Unused {}'],
+    'com/app/util/Helper.java': ['package com.app.util;', 'public class Helper {}'],
+    'com/app/util/Other.java': ['package com.app.util;', 'public class Other {}'],
+    'com/app/consts/Keys.java': ['package com.app.consts;', 'public class Keys {}'],
+    'com/app/other/Qualified.java': ['package com.app.other;', 'public class Qualified {}'],
+    'com/izforge/izpack/Custom.java': ['package com.izforge.izpack;', 'public class Custom {}'],
+    'com/app/Panel.java': ['package com.app;',
+                           'import com.izforge.izpack.Custom;',
+                           'public class Panel extends Custom {}']
+}
+
+
+class TestImportGraph(unittest.TestCase):
+    """
+    Basic testing of the import graph of custom classes.
+    """
+
+    def setUp(self):
+        self.root = tempfile.mkdtemp() + '/'
+        for name, lines in sources.items():
+            path = os.path.join(self.root, name)
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            with open(path, 'w') as f:
+                f.write('\n'.join(lines) + '\n')
+        self.classes = IzClasses(self.root).container
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, name):
+        return self.root + name
+
+    def test_reachable(self):
+        """
+        Explicit, static, wildcard, same-package and qualified references are all followed, except to izpack classes.
+        """
+        for scanner in ['python', 'grep']:
+            graph = ImportGraph(self.classes, get_scanner(scanner))
+            found = graph.reachable([self.path('com/app/Main.java'), self.path('com/app/Panel.java')])
+            expected = set(self.path(name) for name in ['com/app/Main.java', 'com/app/Base.java', 'com/app/Panel.java',
+                                                        'com/app/util/Helper.java', 'com/app/consts/Keys.java',
+                                                        'com/app/other/Qualified.java'])
+            self.assertEquals(found, expected, msg=scanner)
+            self.assertEquals(graph.reachable([]), set())
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,153 @@
+import os
+import shutil
+import tempfile
+from IzVerifier.izverifier import IzVerifier
+from IzVerifier.izspecs.containers.izclasses import IzClasses
+from IzVerifier.izspecs.containers.izconditions import IzConditions
+from IzVerifier.izspecs.containers.constants import *
+from IzVerifier.izspecs.verifiers.index import ReferenceIndex
+from IzVerifier.izspecs.verifiers.seeker import Seeker
+from IzVerifier.izspecs.verifiers.symbols import SymbolIndex
+
+__author__ = 'fcanas'
+
+import unittest
+
+path1 = 'data/sample_installer_iz5/izpack/'
+path2 = 'data/sample_installer_iz5/resources/'
+source_path2 = 'data/sample_code_base/src/'
+pom = 'data/sample_installer_iz5/pom.xml'
+
+
+class TestReferenceIndex(unittest.TestCase):
+    """
+    Basic testing of the persistent reference index.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        self.sources = os.path.join(self.tmp, 'src')
+        shutil.copytree(source_path2, self.sources)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def verifier(self, index=True):
+        args = {
+            'specs_path': path1,
+            'sources': [self.sources],
+            'resources_path': path2,
+            'pom': pom
+        }
+        if index:
+            args['index'] = os.path.join(self.tmp, 'references.idx')
+        return IzVerifier(args)
+
+    def test_indexedRuns(self):
+        """
+        Indexed runs find the same references as unindexed ones, and only search changed files again.
+        """
+        expected = self.verifier(index=False).verify_all()
+
+        first = self.verifier()
+        self.assertEquals(first.verify_all(), expected)
+        self.assertEquals(first.index.hits, 0)
+        first.index.close()
+
+        second = self.verifier()
+        self.assertEquals(second.verify_all(), expected)
+        self.assertEquals(second.index.misses, 0)
+        second.index.close()
+
+        changed = os.path.join(self.sources, 'com/sample/installer/Foo.java')
+        with open(changed, 'a') as f:
+            f.write('\nclass Changed { String s = idata.getVariable("indexed.variable"); }\n')
+
+        third = self.verifier()
+        missing = third.verify_all()
+        self.assertTrue(('indexed.variable', changed) in missing)
+        self.assertEquals(missing - {('indexed.variable', changed)}, expected)
+
+        # Only the changed file was searched again, for each of the three specs' queries.
+        self.assertEquals(third.index.misses, 0)
+        self.assertEquals(second.index.hits - third.index.hits, 3)
+        third.index.close()
+
+    def test_dependencies(self):
+        """
+        Hits resolving constants declared in another file are searched again when that file changes.
+        """
+        constants = os.path.join(self.sources, 'com/sample/installer/Constants.java')
+        with open(constants, 'w') as f:
+            f.write('class Constants { static final String COND = "shared.condition.1"; }\n')
+        panel = os.path.join(self.sources, 'com/sample/installer/Panel.java')
+        with open(panel, 'w') as f:
+            f.write('class Panel { void run() { rules.isConditionTrue(Constants.COND); } }\n')
+
+        index = ReferenceIndex()
+        props = {
+            'patterns': IzConditions.properties[PATTERNS],
+            'path_list': [self.sources],
+            'white_list_patterns': []
+        }
+
+        seeker = Seeker(None, index=index, classes=IzClasses(self.sources).container)
+        self.assertTrue(('shared.condition.1', panel) in seeker.find_references_in_source(**props))
+        self.assertEquals(sorted(index.dependencies[panel].keys()), sorted([SymbolIndex.classes_dependency, constants]))
+
+        with open(constants, 'w') as f:
+            f.write('class Constants { static final String COND = "shared.condition.10"; }\n')
+
+        seeker = Seeker(None, index=index, classes=IzClasses(self.sources).container)
+        hits = seeker.find_references_in_source(**props)
+        self.assertTrue(('shared.condition.10', panel) in hits)
+        self.assertFalse(('shared.condition.1', panel) in hits)
+
+    def test_unresolvedDependencies(self):
+        """
+        Hits referring to constants of classes that don't exist are searched again when classes are added,
+        and files deleted since they were indexed are dropped from the index.
+        """
+        panel = os.path.join(self.sources, 'com/sample/installer/Panel.java')
+        with open(panel, 'w') as f:
+            f.write('package com.sample.installer;\n'
+                    'class Panel { void run() { rules.isConditionTrue(Shared.KEY); } }\n')
+
+        path = os.path.join(self.tmp, 'references.idx')
+        props = {
+            'patterns': IzConditions.properties[PATTERNS],
+            'path_list': [self.sources],
+            'white_list_patterns': []
+        }
+
+        index = ReferenceIndex(path)
+        seeker = Seeker(None, index=index, classes=IzClasses(self.sources).container)
+        self.assertTrue(('Shared.KEY', panel) in seeker.find_references_in_source(**props))
+        index.close()
+
+        shared = os.path.join(self.sources, 'com/sample/installer/Shared.java')
+        with open(shared, 'w') as f:
+            f.write('package com.sample.installer;\n'
+                    'class Shared { static final String KEY = "shared.condition.1"; }\n')
+
+        index = ReferenceIndex(path)
+        seeker = Seeker(None, index=index, classes=IzClasses(self.sources).container)
+        hits = seeker.find_references_in_source(**props)
+        self.assertTrue(('shared.condition.1', panel) in hits)
+        self.assertFalse(('Shared.KEY', panel) in hits)
+        index.close()
+
+        os.remove(panel)
+        index = ReferenceIndex(path)
+        seeker = Seeker(None, index=index, classes=IzClasses(self.sources).container)
+        self.assertFalse(panel in [hit[1] for hit in seeker.find_references_in_source(**props)])
+        index.close()
+        index = ReferenceIndex(path)
+        self.assertFalse(panel in index.fingerprints)
+        self.assertFalse(panel in index.entries)
+        self.assertFalse(panel in index.dependencies)
+        index.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
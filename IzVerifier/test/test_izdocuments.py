@@ -0,0 +1,116 @@
+import os
+from IzVerifier.izspecs.izdocuments import IzDocuments
+from IzVerifier.izverifier import IzVerifier
+
+__author__ = 'fcanas'
+
+import unittest
+
+path1 = 'data/sample_installer_iz5/izpack/'
+path2 = 'data/sample_installer_iz5/resources/'
+source_path2 = 'data/sample_code_base/src/'
+pom = 'data/sample_installer_iz5/pom.xml'
+
+
+class TestIzDocuments(unittest.TestCase):
+    """
+    Basic testing of the xml documents cache.
+    """
+
+    def test_cachedDocuments(self):
+        """
+        A document is parsed once, and again only when its file changes.
+        """
+        documents = IzDocuments()
+        conditions = path1 + 'conditions.xml'
+
+        soup = documents.get(conditions)
+        self.assertTrue(soup is documents.get(conditions))
+        self.assertEquals(documents.stats(), {'hits': 1, 'misses': 1})
+
+        # Parsed separately for a different parser.
+        self.assertFalse(soup is documents.get(conditions, None))
+        self.assertEquals(documents.misses, 2)
+
+        stat = os.stat(conditions)
+        os.utime(conditions, (stat.st_atime, stat.st_mtime + 1))
+        try:
+            self.assertFalse(soup is documents.get(conditions))
+            self.assertEquals(documents.misses, 3)
+        finally:
+            os.utime(conditions, (stat.st_atime, stat.st_mtime))
+
+    def test_missingDocument(self):
+        """
+        Missing documents raise IOError.
+        """
+        documents = IzDocuments()
+        self.assertRaises(IOError, documents.get, path1 + 'missing.xml')
+
+    def test_sharedDocuments(self):
+        """
+        Each spec file is parsed once per parser for a whole verification run.
+        """
+        args = {
+            'specs_path': path1,
+            'sources': [source_path2],
+            'resources_path': path2,
+            'pom': pom
+        }
+        izv = IzVerifier(args)
+        izv.verify_all()
+        izv.verify('classes')
+        izv.dependency_verification()
+        misses = izv.documents.misses
+
+        izv.verify_all()
+        izv.verify('classes')
+        izv.dependency_verification()
+        self.assertEquals(izv.documents.misses, misses)
+        self.assertTrue(izv.documents.hits > 0)
+
+        # The langpack is only parsed for its definitions and is not kept.
+        langpack = os.path.realpath(izv.paths.get_langpack_path())
+        self.assertFalse((langpack, 'xml') in izv.documents.documents)
+
+    def test_iterparseParity(self):
+        """
+        The streaming parser finds the same definitions and references as BeautifulSoup.
+        """
+        args = {
+            'specs_path': path1,
+            'sources': [source_path2],
+            'resources_path': path2,
+            'pom': pom
+        }
+        soup_izv = IzVerifier(args)
+        args['parser'] = 'iterparse'
+        iterparse_izv = IzVerifier(args)
+
+        for specification in ['conditions', 'variables', 'strings', 'classes']:
+            self.assertEquals(soup_izv.get_container(specification).get_keys(),
+                              iterparse_izv.get_container(specification).get_keys())
+            self.assertEquals(soup_izv.find_specification_references(specification),
+                              iterparse_izv.find_specification_references(specification))
+
+        self.assertEquals(soup_izv.dependency_verification(fail_on_undefined_vars=True).keys(),
+                          iterparse_izv.dependency_verification(fail_on_undefined_vars=True).keys())
+
+    def test_elementViews(self):
+        """
+        Streamed elements offer the parts of the Tag interface used by the containers.
+        """
+        documents = IzDocuments('iterparse')
+        document = documents.get(path1 + 'conditions.xml')
+
+        conditions = document.find_all('condition')
+        self.assertEquals(len(conditions), 33)
+
+        variable = [c for c in conditions if c.get('id') == 'variable1'][0]
+        self.assertEquals(variable['type'], 'variable')
+        self.assertEquals(variable.find('name').text, 'variable1')
+        self.assertEquals(variable.parent.name, 'xfragment')
+        self.assertEquals(variable.sourceline, 12)
+
+        compound = [c for c in conditions if c.get('id') == 'and.3'][0]
+        self.assertEquals([c['refid'] for c in compound.find_all('condition')], ['pack.does.not.exist', 'and.2'])
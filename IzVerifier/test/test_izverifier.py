@@ -2,6 +2,12 @@ from IzVerifier.izspecs.containers.izclasses import IzClasses
 
 __author__ = 'fcanas'
 
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
 import unittest
 
 from IzVerifier.izspecs.containers.izconditions import IzConditions
@@ -65,6 +71,14 @@ class TestVerifier(unittest.TestCase):
         print num
         self.assertEquals(num, 15, str(num) + "!=15")
 
+        # Conditions are stored as compact records.
+        record = izc.container['and.3']
+        self.assertEquals(record.type, 'and')
+        self.assertEquals(record.refs, ('pack.does.not.exist', 'and.2'))
+        self.assertEquals(izc.container['variable1'].value, 'variable1')
+        self.assertEquals(izc.container['static.field.condition2'].value, None)
+        self.assertEquals(izc.referenced_variables(), {('variable1', 'variable1')})
+
     def test_langpack_paths(self):
         """
         Test that we parsed the langpack paths from resources.xml
@@ -163,6 +177,178 @@ class TestVerifier(unittest.TestCase):
         num = len(hits)
         assert (num != 0)
 
+    def test_findCodeReferencesMany(self):
+        """
+        A single combined scan finds exactly the references of each per-spec scan.
+        """
+        specifications = ['conditions', 'variables', 'strings']
+        hits = self.izv.find_code_references_many(specifications)
+
+        for specification in specifications:
+            self.assertEquals(hits[specification], self.izv.find_code_references(specification))
+
+    def test_instrumentation(self):
+        """
+        Instrumented runs record the time of each phase and count key events.
+        """
+        self.assertEquals(self.izv.get_instrumentation(), {'phases': {}, 'counters': {}})
+
+        events = []
+        args = {
+            'specs_path': path1,
+            'sources': [source_path2],
+            'resources_path': path2,
+            'pom': pom,
+            'callbacks': [lambda event, name, value: events.append((event, name))]
+        }
+        izv = IzVerifier(args)
+        izv.verify_all(filter_classes=True)
+        izv.dependency_verification()
+        results = izv.get_instrumentation()
+
+        for phase in ['paths', 'classes', 'referenced classes', 'container parsing', 'verify',
+                      'source search', 'spec search', 'variable lookups', 'xml parsing', 'dependency verification']:
+            self.assertTrue(results['phases'][phase]['calls'] > 0, msg=phase)
+        for counter in ['files read', 'xml documents parsed', 'document cache hits', 'regex evaluations',
+                        'lines processed', 'constants tables built', 'condition visits']:
+            self.assertTrue(results['counters'][counter] > 0, msg=counter)
+        self.assertTrue(('phase', 'verify') in events)
+        self.assertTrue(('count', 'files read') in events)
+
+        args['scanner'] = 'grep'
+        izv = IzVerifier(args)
+        izv.verify('strings')
+        self.assertTrue(izv.get_instrumentation()['counters']['subprocesses'] > 0)
+
+    def test_trace(self):
+        """
+        Traced runs write a trace-event file with spans for verifications, searches, parses and conditions.
+        """
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, 'trace.json')
+            args = {
+                'specs_path': path1,
+                'sources': [source_path2],
+                'resources_path': path2,
+                'pom': pom,
+                'trace': path
+            }
+            izv = IzVerifier(args)
+            izv.verify('strings')
+            izv.dependency_verification()
+            izv.instrumentation.trace.close()
+
+            with open(path) as f:
+                events = json.load(f)
+            names = set(event['name'] for event in events)
+            for name in ['verify(strings)', 'search_source_for_patterns', 'search_spec_for_attributes',
+                         'find_variable_value', 'parse', 'condition', 'verify', 'dependency verification']:
+                self.assertTrue(name in names, msg=name)
+            for event in events:
+                self.assertEquals(event['ph'], 'X')
+                self.assertTrue(event['dur'] >= 0)
+            self.assertTrue({'id': 'and.3'} in [event.get('args') for event in events])
+        finally:
+            shutil.rmtree(root)
+
+    def test_parallelScan(self):
+        """
+        Searching source code across several worker processes finds exactly the serial run's references.
+        """
+        args = {
+            'specs_path': path1,
+            'sources': [source_path2],
+            'resources_path': path2,
+            'pom': pom,
+            'workers': 2
+        }
+        izv = IzVerifier(args)
+        self.assertEquals(izv.verify_all(), self.izv.verify_all())
+        self.assertEquals(izv.verify_all(filter_classes=True), self.izv.verify_all(filter_classes=True))
+
+    def test_findReferencesMany(self):
+        """
+        A batched lookup finds exactly the references of each single-id lookup.
+        """
+        ids = ['some.user.password', 'password.empty', 'some.string.3', 'some.condition.1', 'some.user', 'no.such.id']
+        hits = self.izv.find_references_many(ids)
+        self.assertEquals(sorted(hits.keys()), sorted(ids))
+        for rid in ids:
+            self.assertEquals(hits[rid], self.izv.find_references(rid), msg=rid)
+
+    def test_findReferencesManyPaths(self):
+        """
+        A batched lookup doesn't match the ids' patterns against the paths of the searched files.
+        """
+        root = tempfile.mkdtemp()
+        try:
+            os.makedirs(os.path.join(root, 'com', 'sample', 'system'))
+            with open(os.path.join(root, 'com', 'sample', 'system', 'SystemPanel.java'), 'w') as f:
+                f.write('idata.langpack.getString("a.key"); log.println("b.key");\n')
+            for scanner in ['python', 'grep']:
+                izv = IzVerifier({
+                    'specs_path': path1,
+                    'sources': [root],
+                    'resources_path': path2,
+                    'pom': pom,
+                    'scanner': scanner
+                })
+                hits = izv.find_references_many(['a.key', 'b.key'], ['strings'])
+                for rid in ['a.key', 'b.key']:
+                    self.assertEquals(hits[rid], izv.find_references(rid, ['strings']), msg=scanner)
+                self.assertEquals(hits['b.key'], set(), msg=scanner)
+        finally:
+            shutil.rmtree(root)
+
+    def test_impact(self):
+        """
+        Impact queries find the conditions depending on an id, transitively, and the references to them.
+        """
+        results = self.izv.impact('variable1', 'variables')
+        self.assertEquals(results['conditions'], {'variable1', 'and.1', 'and.2', 'and.3', 'short.1'})
+        self.assertTrue(('variable1', 'data/sample_installer_iz5/resources/userInputSpec.xml') in results['references'])
+        self.assertTrue(('and.2', 'data/sample_code_base/src/com/sample/installer/Foo.java') in results['references'])
+
+        results = self.izv.impact('pack.does.not.exist')
+        self.assertEquals(results['conditions'], {'and.3', 'short.1'})
+        self.assertEquals(self.izv.impact('no.such.id'), {'conditions': set(), 'references': set()})
+
+    def test_lazyConstruction(self):
+        """
+        Nothing is parsed until it is used, and lookups only parse what they need.
+        """
+        args = {
+            'specs_path': path1,
+            'sources': [source_path2],
+            'resources_path': path2,
+            'pom': pom,
+            'instrument': True
+        }
+        izv = IzVerifier(args)
+        self.assertEquals(izv.get_instrumentation()['phases'], {})
+
+        self.assertEquals(izv.find_references('some.user.password'), self.izv.find_references('some.user.password'))
+        phases = izv.get_instrumentation()['phases']
+        self.assertTrue('paths' in phases)
+        self.assertFalse('referenced classes' in phases)
+        self.assertFalse('classes' in phases)
+
+        self.assertEquals(izv.verify('strings'), self.izv.verify('strings'))
+        self.assertFalse('classes' in izv.get_instrumentation()['phases'])
+
+        self.assertEquals(izv.referenced_classes, self.izv.referenced_classes)
+        self.assertEquals(izv.get_instrumentation()['phases']['referenced classes']['calls'], 1)
+
+    def test_deferredImports(self):
+        """
+        Importing IzVerifier doesn't load xml parsers, subprocess, sqlite3 or multiprocessing.
+        """
+        heavy = ['bs4', 'lxml', 'subprocess', 'sqlite3', 'multiprocessing']
+        probe = 'import sys, IzVerifier.izverifier; print [name for name in {0!r} if name in sys.modules]'.format(heavy)
+        output = subprocess.check_output([sys.executable, '-c', probe])
+        self.assertEquals(output.strip(), '[]')
+
     def test_findReference(self):
         """
         Find some references to items in source code and specs.
@@ -1,4 +1,9 @@
+import os
+import re
+import shutil
+import tempfile
 from IzVerifier.izspecs.izproperties import IzProperties
+from IzVerifier.izspecs.containers.izclasses import IzClasses
 
 __author__ = 'fcanas'
 
@@ -7,7 +12,9 @@ import unittest
 from IzVerifier.izspecs.containers.izconditions import IzConditions
 from IzVerifier.izspecs.containers.izstrings import IzStrings
 from IzVerifier.izspecs.containers.izvariables import IzVariables
-from IzVerifier.izspecs.verifiers.seeker import Seeker
+from IzVerifier.izspecs.verifiers.seeker import Seeker, compiled, _compiled
+from IzVerifier.izspecs.verifiers.scanner import MAX_COMPILED, find_executable, get_scanner
+from IzVerifier.izspecs.verifiers.symbols import SymbolIndex
 from IzVerifier.izverifier import IzVerifier
 from IzVerifier.izspecs.containers.constants import *
 
@@ -181,3 +188,230 @@ class TestSeeker(unittest.TestCase):
                 self.assertEquals(hit[2], key[0])
 
 
+
+    def test_scannerParity(self):
+        """
+        The in-process scanner finds exactly what grep finds in source code.
+        """
+        grep_seeker = Seeker(None, 'grep')
+        python_seeker = Seeker(None, 'python')
+
+        for container in [self.strings, self.conditions, self.variables]:
+            props = {
+                'patterns': container.properties[PATTERNS],
+                'path_list': [source_path2],
+                'white_list_patterns': container.properties[WHITE_LIST_PATTERNS]
+            }
+            grep_hits = grep_seeker.find_references_in_source(**props)
+            python_hits = python_seeker.find_references_in_source(**props)
+            self.assertEquals(grep_hits, python_hits)
+
+    @unittest.skipIf(find_executable('rg') is None, 'ripgrep (rg) is not installed')
+    def test_ripgrepParity(self):
+        """
+        The ripgrep scanner finds exactly what grep finds, in source code, single files and lists of files.
+        """
+        grep_seeker = Seeker(None, 'grep')
+        rg_seeker = Seeker(None, 'ripgrep')
+
+        for container in [self.strings, self.conditions, self.variables]:
+            props = {
+                'patterns': container.properties[PATTERNS],
+                'path_list': [source_path2],
+                'white_list_patterns': container.properties[WHITE_LIST_PATTERNS]
+            }
+            self.assertEquals(rg_seeker.find_references_in_source(**props), grep_seeker.find_references_in_source(**props))
+
+        source = source_path2 + 'com/sample/installer/Foo.java'
+        for pattern in ['getString\\(', 'import\\s+.+;', 'no such line']:
+            self.assertEquals(sorted(rg_seeker.scanner.search(source, pattern)),
+                              sorted(line for line in grep_seeker.scanner.search(source, pattern) if line))
+        files = grep_seeker.scanner.files(source_path2)
+        self.assertEquals(rg_seeker.scanner.files(source_path2), files)
+        rg_lines = rg_seeker.scanner.search_files(files, ['String', 'getString'])
+        grep_lines = grep_seeker.scanner.search_files(files, ['String', 'getString'])
+        for pattern in ['String', 'getString']:
+            self.assertEquals(sorted(rg_lines[pattern]), sorted(line for line in grep_lines[pattern] if line))
+
+        verifier = IzVerifier({'specs_path': path1, 'sources': [source_path2], 'resources_path': path2, 'pom': pom,
+                               'scanner': 'ripgrep'})
+        self.assertEquals(verifier.verify_all(), self.verifier.verify_all())
+        self.assertEquals(verifier.dependency_verification(), self.verifier.dependency_verification())
+
+    def test_streamedSearch(self):
+        """
+        Scanners stream the lines they find, and searches stop reading them once max_hits hits are found.
+        """
+        scanners = ['python', 'grep']
+        if find_executable('rg') is not None:
+            scanners.append('ripgrep')
+        search_pattern, extract_pattern = Seeker.combine_patterns(self.strings.properties[PATTERNS])
+        white_list = self.strings.properties[WHITE_LIST_PATTERNS]
+
+        for name in scanners:
+            seeker = Seeker(None, name)
+            stream = seeker.scanner.iter_search(source_path2, search_pattern)
+            self.assertFalse(isinstance(stream, list))
+            self.assertEquals(sorted(stream), sorted(line for line in seeker.scanner.search(source_path2, search_pattern)
+                                                     if line))
+            stream = seeker.scanner.iter_search(source_path2, search_pattern)
+            next(stream)
+            stream.close()
+
+            hits = seeker.search_source_for_pattern(source_path2, search_pattern, extract_pattern, white_list)
+            self.assertTrue(len(hits) > 2, msg=name)
+            capped = Seeker(None, name, max_hits=2)
+            capped_hits = capped.search_source_for_pattern(source_path2, search_pattern, extract_pattern, white_list)
+            self.assertEquals(len(capped_hits), 2, msg=name)
+            self.assertTrue(capped_hits <= hits, msg=name)
+
+            patterns = [search_pattern, 'String']
+            files = seeker.scanner.files(source_path2)
+            found = seeker.scanner.search_files(files, patterns)
+            for pattern in patterns:
+                self.assertEquals(sorted(line for found_pattern, line in seeker.scanner.iter_search_files(files, patterns)
+                                         if found_pattern == pattern), sorted(found[pattern]), msg=name)
+
+            searches = [Seeker.combine_patterns(container.properties[PATTERNS]) +
+                        (container.properties[WHITE_LIST_PATTERNS],)
+                        for container in [self.strings, self.conditions, self.variables]]
+            expected = seeker.search_source_for_patterns(source_path2, searches)
+            for found in [capped.search_source_for_patterns(source_path2, searches),
+                          capped.search_files(files, searches)[0]]:
+                for capped_hits, hits in zip(found, expected):
+                    if isinstance(capped_hits, dict):
+                        self.assertTrue(all(len(keys) <= 2 for keys in capped_hits.values()), msg=name)
+                        capped_hits = set().union(*capped_hits.values())
+                    else:
+                        self.assertTrue(len(capped_hits) <= 2, msg=name)
+                    self.assertTrue(capped_hits <= hits, msg=name)
+                    self.assertEquals(len(capped_hits) > 0, len(hits) > 0, msg=name)
+
+    def test_hitCapWithMessages(self):
+        """
+        Keys found through a Messages object count towards max_hits.
+        """
+        root = tempfile.mkdtemp()
+        try:
+            with open(os.path.join(root, 'Panel.java'), 'w') as f:
+                f.write('class Panel {\n'
+                        '    String s = idata.langpack.getString("direct.key");\n'
+                        '    Messages mess = idata.getMessages();\n'
+                        '    String a = mess.get("messages.key.1");\n'
+                        '    String b = mess.get("messages.key.2");\n'
+                        '}\n')
+            search_pattern, extract_pattern = Seeker.combine_patterns(self.strings.properties[PATTERNS])
+            white_list = self.strings.properties[WHITE_LIST_PATTERNS]
+            for name in ['python', 'grep']:
+                hits = Seeker(None, name).search_source_for_pattern(root, search_pattern, extract_pattern, white_list)
+                self.assertEquals(len(hits), 3, msg=name)
+                capped = Seeker(None, name, max_hits=2)
+                self.assertEquals(len(capped.search_source_for_pattern(root, search_pattern, extract_pattern, white_list)),
+                                  2, msg=name)
+        finally:
+            shutil.rmtree(root)
+
+    def test_boundedPatternCaches(self):
+        """
+        Compiled regexes are cached, but the caches never grow past MAX_COMPILED patterns, and a full
+        cache only drops its oldest pattern.
+        """
+        scanner = get_scanner('python')
+        patterns = ['bounded\.pattern\.{0}'.format(count) for count in range(MAX_COMPILED + 10)]
+        for pattern in patterns:
+            self.assertTrue(compiled(pattern) is compiled(pattern))
+            self.assertTrue(scanner.compile(pattern) is scanner.compile(pattern))
+        self.assertEquals(len(_compiled), MAX_COMPILED)
+        self.assertEquals(len(scanner.compiled), MAX_COMPILED)
+        self.assertEquals(list(scanner.compiled), patterns[10:])
+        self.assertEquals(list(_compiled)[-MAX_COMPILED / 2:], patterns[-MAX_COMPILED / 2:])
+
+    def test_stringConstants(self):
+        """
+        String constants are looked up in a table built with a single search of their file.
+        """
+        foo = source_path2 + 'com/sample/installer/Foo.java'
+        seeker = Seeker(None)
+
+        self.assertEquals(seeker.find_variable_value('key1', foo, []), 'some.string.1')
+        self.assertEquals(seeker.find_variable_value('someVar', foo, []), 'some.undefined.var.1')
+        self.assertEquals(seeker.find_variable_value('val', foo, []), None)
+        self.assertEquals(seeker.find_variable_value('key1', foo, ['.*String key1']), None)
+
+        self.assertEquals(len(seeker.constants), 2)
+        self.assertEquals(seeker.constants[(foo, ())]['key3'], {('some.string.6', 'UNKNOWN')})
+
+    def test_crossFileConstants(self):
+        """
+        Constants declared in other classes are resolved through imports, static imports and supertypes.
+        """
+        root = tempfile.mkdtemp()
+        try:
+            files = {
+                'com/sample/shared/Constants.java': [
+                    'package com.sample.shared;',
+                    'public class Constants {',
+                    '    public static final String COND = "shared.condition.1";',
+                    '    public static final String OTHER = "shared.condition.2";',
+                    '}'],
+                'com/sample/shared/Keys.java': [
+                    'package com.sample.shared;',
+                    'public interface Keys {',
+                    '    String KEY = "shared.string.1";',
+                    '}'],
+                'com/sample/app/Panel.java': [
+                    'package com.sample.app;',
+                    'import com.sample.shared.Constants;',
+                    'import static com.sample.shared.Constants.OTHER;',
+                    'public class Panel implements com.sample.shared.Keys {',
+                    '    void run() {',
+                    '        rules.isConditionTrue(Constants.COND);',
+                    '        rules.isConditionTrue(OTHER);',
+                    '        rules.isConditionTrue(Unknown.COND);',
+                    '        idata.langpack.getString(KEY);',
+                    '    }',
+                    '}']
+            }
+            for name, lines in files.items():
+                path = os.path.join(root, name)
+                if not os.path.isdir(os.path.dirname(path)):
+                    os.makedirs(os.path.dirname(path))
+                with open(path, 'w') as f:
+                    f.write('\n'.join(lines) + '\n')
+
+            panel = os.path.join(root, 'com/sample/app/Panel.java')
+            seeker = Seeker(None, classes=IzClasses(root).container)
+            hits = seeker.find_references_in_source(patterns=IzConditions.properties[PATTERNS],
+                                                    path_list=[root],
+                                                    white_list_patterns=[])
+            self.assertEquals(hits, {('shared.condition.1', panel),
+                                     ('shared.condition.2', panel),
+                                     ('Unknown.COND', panel)})
+
+            hits = seeker.find_references_in_source(patterns=IzStrings.properties[PATTERNS],
+                                                    path_list=[root],
+                                                    white_list_patterns=[])
+            self.assertEquals(hits, {('shared.string.1', panel)})
+            self.assertEquals(seeker.symbols.dependencies[panel],
+                              {os.path.join(root, 'com/sample/shared/Constants.java'),
+                               os.path.join(root, 'com/sample/shared/Keys.java'),
+                               SymbolIndex.classes_dependency})
+        finally:
+            shutil.rmtree(root)
+
+    def test_whitelistMatcher(self):
+        """
+        The combined whitelist alternation matches exactly the lines matched by any of its patterns.
+        """
+        seeker = Seeker(None)
+        white_lists = [IzStrings.properties[WHITE_LIST_PATTERNS],
+                       ['^import\s+com.izforge.izpack.*;$', '^import\s+java.*;$'],
+                       ['(a)b\\1', 'x'],
+                       []]
+        lines = ['import java.util.List;', 'import com.sample.Foo;', 'UserInputPanel.get("a")',
+                 'abab', 'abx', 'x = ((String) conn);', '']
+
+        for white_list in white_lists:
+            for line in lines:
+                expected = any(re.match(pattern, line) for pattern in white_list)
+                self.assertEquals(seeker.in_grep_whitelist(line, white_list), expected)
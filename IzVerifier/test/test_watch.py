@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+from IzVerifier.izverifier import IzVerifier
+from IzVerifier.watch import Watcher
+
+__author__ = 'fcanas'
+
+import unittest
+
+installer = 'data/sample_installer_iz5/'
+source_path2 = 'data/sample_code_base/src/'
+
+
+class TestWatcher(unittest.TestCase):
+    """
+    Basic testing of incremental re-verification in watch mode.
+    """
+
+    def setUp(self):
+        self.tmp = tempfile.mkdtemp()
+        shutil.copytree(installer, os.path.join(self.tmp, 'installer'))
+        shutil.copytree(source_path2, os.path.join(self.tmp, 'src'))
+        self.args = {
+            'specs_path': os.path.join(self.tmp, 'installer', 'izpack/'),
+            'resources_path': os.path.join(self.tmp, 'installer', 'resources/'),
+            'pom': os.path.join(self.tmp, 'installer', 'pom.xml'),
+            'sources': [os.path.join(self.tmp, 'src/')]
+        }
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp)
+
+    def edit(self, path, old, new):
+        """
+        Replaces the last occurrence of old with new in the file at path, making sure its modification
+        time changes.
+        """
+        with open(path) as f:
+            content = f.read()
+        with open(path, 'w') as f:
+            f.write(new.join(content.rsplit(old, 1)))
+        stat = os.stat(path)
+        os.utime(path, (stat.st_atime, stat.st_mtime + 10))
+
+    def test_incrementalChecks(self):
+        """
+        Checks only report what changed, and match a fresh verifier's results.
+        """
+        watcher = Watcher(self.args, verbosity=0)
+        first = watcher.check()
+        self.assertEquals(first['undefined'], IzVerifier(self.args).verify_all())
+        self.assertEquals(watcher.check(), None)
+
+        source = os.path.join(self.tmp, 'src', 'com', 'sample', 'installer', 'Foo.java')
+        self.edit(source, '}', '    String s = idata.langpack.getString("brand.new.key");\n}')
+        changes = watcher.check()
+        self.assertEquals(changes['files'], {source})
+        self.assertEquals(changes['undefined'], {('brand.new.key', source)})
+        self.assertEquals(changes['fixed'], set())
+        self.assertEquals(changes['conditions'], {})
+        self.assertEquals(watcher.undefined, IzVerifier(self.args).verify_all())
+
+        conditions = watcher.verifier.paths.get_path('conditions')
+        self.edit(conditions, '</xfragment>', '<condition type="variable" id="some.condition.1">'
+                                               '<name>variable1</name><value>true</value></condition>\n</xfragment>')
+        changes = watcher.check()
+        self.assertEquals(changes['files'], {conditions})
+        self.assertTrue('some.condition.1' in [hit[0] for hit in changes['fixed']])
+        self.assertEquals(watcher.undefined, IzVerifier(self.args).verify_all())
+        self.assertEquals(watcher.failures, IzVerifier(self.args).dependency_verification())
+
+    def test_removedReferences(self):
+        """
+        References removed from a changed source file are dropped from the referenced maps.
+        """
+        watcher = Watcher(self.args, verbosity=0)
+        watcher.check()
+        source = os.path.join(self.tmp, 'src', 'com', 'sample', 'installer', 'Foo.java')
+        self.assertTrue('some.string.4' in watcher.verifier.get_referenced('strings'))
+
+        self.edit(source, 'String key2 = "some.string.4";', '')
+        changes = watcher.check()
+        self.assertTrue(('some.string.4', source) in changes['fixed'])
+        self.assertFalse('some.string.4' in watcher.verifier.get_referenced('strings'))
+
+        izv = IzVerifier(self.args)
+        izv.verify_all()
+        for specification in izv.specifications:
+            self.assertEquals(watcher.verifier.get_referenced(specification), izv.get_referenced(specification))
+
+
+if __name__ == '__main__':
+    unittest.main()
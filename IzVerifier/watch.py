@@ -0,0 +1,136 @@
+"""
+Watch mode: keeps an IzVerifier in memory, polls the installer's specs, resources and source roots
+for changes, and re-verifies incrementally when files change, reporting only what changed: undefined
+references found or fixed, and conditions whose dependency failures changed.
+
+Only the changed files are parsed or searched again. Hits from unchanged files come from an in-memory
+reference index (see IzVerifier.refresh).
+
+Usage:
+
+    python -m IzVerifier.watch --specs-path izpack/ --resources-path resources/ [--pom pom.xml] \\
+                               [--sources src/ ...] [--interval 1.0]
+"""
+import argparse
+import time
+
+from IzVerifier.izverifier import IzVerifier
+
+__author__ = 'fcanas'
+
+
+class Watcher():
+    """
+    Re-verifies an installer as its files change.
+    """
+
+    def __init__(self, args, interval=1.0, verbosity=1, filter_classes=False):
+        """
+        Args are the IzVerifier args; unless an index is given, an in-memory one is used.
+        Interval is the number of seconds between two polls of the files.
+        With verbosity above 0, the changes found by each check are reported.
+        """
+        args = dict(args)
+        args.setdefault('index', True)
+        self.verifier = IzVerifier(args)
+        self.verifier.refresh()
+        self.interval = interval
+        self.verbosity = verbosity
+        self.filter_classes = filter_classes
+        self.undefined = None
+        self.failures = None
+
+    def check(self):
+        """
+        Re-verifies the installer if any of its files changed since the last check; the first check
+        always verifies it. Returns None if nothing changed, and otherwise the changes in the form:
+        {
+            'files': set(paths of the changed files),
+            'undefined': set((id, location) of the undefined references found),
+            'fixed': set((id, location) of the undefined references no longer found),
+            'conditions': {condition_id: paths, ...} for the conditions whose failure paths changed,
+                          with an empty set for those that no longer fail
+        }
+        """
+        changed = self.verifier.refresh()
+        if self.undefined is not None and not changed:
+            return None
+
+        undefined = self.verifier.verify_all(filter_classes=self.filter_classes)
+        failures = self.verifier.dependency_verification(filter_classes=self.filter_classes)
+        previous_undefined = self.undefined or set()
+        previous_failures = self.failures or {}
+        self.undefined = undefined
+        self.failures = failures
+
+        conditions = {}
+        for cid in set(failures) | set(previous_failures):
+            if not cid in failures:
+                conditions[cid] = set()
+            elif not cid in previous_failures or failures[cid] != previous_failures[cid]:
+                conditions[cid] = failures[cid]
+
+        changes = {
+            'files': changed,
+            'undefined': undefined - previous_undefined,
+            'fixed': previous_undefined - undefined,
+            'conditions': conditions
+        }
+        if self.verbosity > 0:
+            self.report(changes)
+        return changes
+
+    def report(self, changes):
+        """
+        Reports the changes found by a check.
+        """
+        reporter = self.verifier.reporter
+        if changes['files']:
+            reporter.report_test('changed files', changes['files'])
+        reporter.report_test('undefined references found', changes['undefined'])
+        reporter.report_test('undefined references fixed', changes['fixed'])
+        fixed = set(cid for cid, paths in changes['conditions'].items() if not paths)
+        if fixed:
+            reporter.report_test('conditions fixed', fixed)
+        reporter.display_paths(dict((cid, paths) for cid, paths in changes['conditions'].items() if paths))
+
+    def watch(self, checks=None):
+        """
+        Checks the files every interval seconds, forever or for the given number of checks.
+        """
+        count = 0
+        while checks is None or count < checks:
+            if count:
+                time.sleep(self.interval)
+            self.check()
+            count += 1
+
+
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Re-verifies an IzPack installer as its files change.')
+    parser.add_argument('--specs-path', dest='specs_path', required=True)
+    parser.add_argument('--resources-path', dest='resources_path', required=True)
+    parser.add_argument('--pom')
+    parser.add_argument('--sources', nargs='*', default=[])
+    parser.add_argument('--scanner')
+    parser.add_argument('--parser')
+    parser.add_argument('--index')
+    parser.add_argument('--max-hits', dest='max_hits', type=int)
+    parser.add_argument('--interval', type=float, default=1.0, help='seconds between two polls of the files')
+    parser.add_argument('--filter-classes', dest='filter_classes', action='store_true')
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    options = parse_arguments(argv)
+    args = dict((key, value) for key, value in vars(options).items()
+                if value is not None and not key in ['interval', 'filter_classes'])
+    watcher = Watcher(args, options.interval, filter_classes=options.filter_classes)
+    try:
+        watcher.watch()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == '__main__':
+    main()
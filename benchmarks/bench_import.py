@@ -0,0 +1,72 @@
+"""
+Benchmark of IzVerifier's import time, as paid by every cold command line invocation.
+
+Each repeat imports the module in a fresh interpreter, timing the import alone and the whole process,
+and lists the heavy modules (xml parsers, subprocess, sqlite3, multiprocessing) the import pulled in.
+Those should only be loaded when a parse, search or index actually needs them.
+
+Usage, from the root of the repository:
+
+    python benchmarks/bench_import.py [--module IzVerifier.izverifier] [--repeat 10] [--max seconds]
+
+With --max, exits with an error if the best import time is above the given number of seconds.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+__author__ = 'fcanas'
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+
+HEAVY_MODULES = ['bs4', 'lxml', 'subprocess', 'sqlite3', 'multiprocessing']
+
+PROBE = """
+import json, sys, time
+start = time.time()
+import {module}
+elapsed = time.time() - start
+print json.dumps({{'time': elapsed, 'modules': len(sys.modules), 'heavy': [name for name in {heavy!r} if name in sys.modules]}})
+"""
+
+
+def time_import(module):
+    """
+    Imports module in a fresh interpreter. Returns the import's time, the whole process's time, the number
+    of modules loaded and the heavy modules among them.
+    """
+    start = time.time()
+    output = subprocess.check_output([sys.executable, '-c', PROBE.format(module=module, heavy=HEAVY_MODULES)],
+                                     cwd=ROOT)
+    result = json.loads(output.strip().splitlines()[-1])
+    result['process'] = time.time() - start
+    return result
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description="Times IzVerifier's import in fresh interpreters.")
+    parser.add_argument('--module', default='IzVerifier.izverifier')
+    parser.add_argument('--repeat', type=int, default=10, help='fresh interpreters to time, the best is kept')
+    parser.add_argument('--max', type=float, help='fails if the best import time is above this many seconds')
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    options = parse_arguments(argv)
+    results = [time_import(options.module) for repeat in range(options.repeat)]
+    best = min(results, key=lambda result: result['time'])
+
+    print 'import {0}: {1:.4f}s (process {2:.4f}s), {3} modules loaded'.format(
+        options.module, best['time'], min(result['process'] for result in results), best['modules'])
+    print 'heavy modules loaded: {0}'.format(', '.join(best['heavy']) or 'none')
+
+    if options.max is not None and best['time'] > options.max:
+        print 'import time above {0}s'.format(options.max)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
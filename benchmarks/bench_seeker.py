@@ -0,0 +1,59 @@
+"""
+Micro-benchmark of the Seeker's per-line processing of scanner output: comment and white list
+filtering, key and location extraction, and key processing.
+
+Usage, from the root of the repository:
+
+    python benchmarks/bench_seeker.py [number of lines] [repeats]
+"""
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from IzVerifier.izspecs.containers.constants import *
+from IzVerifier.izspecs.containers.izstrings import IzStrings
+from IzVerifier.izspecs.verifiers.seeker import Seeker
+
+__author__ = 'fcanas'
+
+
+def scanner_lines(count):
+    """
+    Returns count lines of scanner output, as found when searching a source folder for string references.
+    """
+    templates = [
+        'src/com/sample/installer/Panel{0}.java:        String text = idata.langpack.getString("panel.string.{0}");',
+        'src/com/sample/installer/Panel{0}.java:        handler.setError("panel.error.{0}");',
+        'src/com/sample/installer/Panel{0}.java:        // idata.langpack.getString("commented.string.{0}");',
+        'src/com/sample/installer/Panel{0}.java:        handler.setMessage(prefix + "panel.message.{0}");',
+        'src/com/sample/installer/Panel{0}.java:        System.out.println(idata.langpack.getString("panel.string.{0}"));',
+        'src/com/sample/installer/Panel{0}.java:UserInputPanel panel = idata.langpack.getString("panel.ignored.{0}");',
+    ]
+    return [templates[i % len(templates)].format(i) for i in range(count)]
+
+
+def run(count=100000, repeats=3):
+    """
+    Times the processing of count lines, and returns the best rate in lines per second.
+    """
+    seeker = Seeker(None)
+    lines = scanner_lines(count)
+    search_pattern, extract_pattern = seeker.combine_patterns(IzStrings.properties[PATTERNS])
+    white_list = IzStrings.properties[WHITE_LIST_PATTERNS]
+
+    best = None
+    for repeat in range(repeats):
+        start = time.time()
+        seeker.process_output(lines, search_pattern, extract_pattern, white_list)
+        elapsed = time.time() - start
+        if best is None or elapsed < best:
+            best = elapsed
+    return count / best
+
+
+if __name__ == '__main__':
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+    print '{0} lines: {1:.0f} lines/s'.format(count, run(count, repeats))
@@ -0,0 +1,301 @@
+"""
+Generator of synthetic IzPack installers and Java source trees of a chosen size, for benchmarking.
+
+The generated installer has the same layout as data/sample_installer_iz5 and the source tree the
+same layout as data/sample_code_base:
+
+    root/pom.xml
+    root/izpack/install.xml, conditions.xml, variables.xml, ...
+    root/resources/userInputSpec.xml, langpacks/CustomLangPack.xml
+    root/src/com/bench/...
+
+Everything is derived from a seeded random generator, so the same knobs always generate the same files.
+A small share of the references made by specs and sources are to undefined ids, so that verifications
+have something to report.
+"""
+import os
+import random
+
+__author__ = 'fcanas'
+
+
+# Default knobs.
+DEFAULTS = {
+    'conditions': 1000,     # Number of conditions.
+    'depth': 3,             # Nesting depth of compound conditions.
+    'variables': 1000,      # Number of variables.
+    'strings': 2000,        # Number of langpack strings.
+    'java_files': 200,      # Number of Java source files.
+    'density': 20,          # References to conditions, variables and strings per Java file.
+    'undefined': 0.02,      # Share of references made to undefined ids.
+    'seed': 0
+}
+
+
+def generate(root, **knobs):
+    """
+    Generates an installer and a source tree under root with the given knobs (see DEFAULTS).
+    Returns the IzVerifier args for them.
+    """
+    settings = dict(DEFAULTS)
+    settings.update(knobs)
+    generator = InstallerGenerator(root, settings)
+    generator.generate()
+    return generator.args()
+
+
+class InstallerGenerator():
+    """
+    Writes the spec files and sources of a synthetic installer.
+    """
+
+    def __init__(self, root, settings):
+        self.root = root
+        self.settings = settings
+        self.random = random.Random(settings['seed'])
+        self.specs_path = os.path.join(root, 'izpack')
+        self.resources_path = os.path.join(root, 'resources')
+        self.sources_path = os.path.join(root, 'src')
+
+    def args(self):
+        return {
+            'specs_path': self.specs_path + '/',
+            'resources_path': self.resources_path + '/',
+            'pom': os.path.join(self.root, 'pom.xml'),
+            'sources': [self.sources_path + '/']
+        }
+
+    def generate(self):
+        for path in [self.specs_path, os.path.join(self.resources_path, 'langpacks'), self.sources_path]:
+            if not os.path.isdir(path):
+                os.makedirs(path)
+
+        self.write_pom()
+        self.write_install()
+        self.write_conditions()
+        self.write_variables()
+        self.write_strings()
+        self.write_specs()
+        self.write_sources()
+
+    def condition_id(self, index):
+        return 'bench.condition.{0}'.format(index)
+
+    def variable_id(self, index):
+        return 'bench.variable.{0}'.format(index)
+
+    def string_id(self, index):
+        return 'bench.string.{0}'.format(index)
+
+    def class_id(self, index):
+        return 'com.bench.pkg{0}.Class{1}'.format(index % 10, index)
+
+    def pick(self, id_fn, count, prefix):
+        """
+        Returns the id of a random entity of count, or of an undefined one.
+        """
+        if count == 0 or self.random.random() < self.settings['undefined']:
+            return 'undefined.{0}.{1}'.format(prefix, self.random.randint(0, 1000000))
+        return id_fn(self.random.randint(0, count - 1))
+
+    def write(self, path, lines):
+        with open(path, 'w') as f:
+            f.write('\n'.join(lines) + '\n')
+
+    def write_pom(self):
+        self.write(os.path.join(self.root, 'pom.xml'), [
+            '<project xmlns="http://maven.apache.org/POM/4.0.0">',
+            '  <modelVersion>4.0.0</modelVersion>',
+            '  <artifactId>bench-installer</artifactId>',
+            '  <properties>',
+            '    <izpack.version>5.0.0</izpack.version>',
+            '  </properties>',
+            '</project>'])
+
+    def write_install(self):
+        java_files = self.settings['java_files']
+        listeners = ['       <listener installer="{0}"/>'.format(self.class_id(index))
+                     for index in range(min(java_files, 5))]
+
+        lines = [
+            '<?xml version="1.0" encoding="UTF-8" ?>',
+            '<installation version="5.0" xmlns="http://izpack.org/schema/installation">',
+            '  <info>',
+            '    <appname>IzVerifier-Benchmark-Installer</appname>',
+            '  </info>',
+            '  <listeners>'] + listeners + ['  </listeners>']
+
+        for spec, name in [('variables', 'variables.xml'),
+                           ('dynamicvariables', 'dynamic_variables.xml'),
+                           ('conditions', 'conditions.xml'),
+                           ('resources', 'resources.xml'),
+                           ('panels', 'panels.xml'),
+                           ('packs', 'packs.xml')]:
+            lines += ['  <{0} xmlns:xi="http://www.w3.org/2001/XInclude">'.format(spec),
+                      '     <xi:include href="{0}"/>'.format(name),
+                      '  </{0}>'.format(spec)]
+
+        lines.append('</installation>')
+        self.write(os.path.join(self.specs_path, 'install.xml'), lines)
+
+        self.write(os.path.join(self.specs_path, 'resources.xml'), [
+            '<?xml version="1.0" encoding="UTF-8" ?>',
+            '<xfragment>',
+            '  <res id="CustomLangPack.xml" src="langpacks/CustomLangPack.xml"/>',
+            '  <res id="CustomLangPack.xml_eng" src="langpacks/CustomLangPack.xml"/>',
+            '  <res id="userInputSpec.xml" src="userInputSpec.xml" parse="yes" type="xml"/>',
+            '</xfragment>'])
+
+    def write_conditions(self):
+        """
+        Conditions are laid out in levels: level 0 conditions test variables, and the compound
+        conditions of each level above refer to two conditions of the level below, up to depth.
+        Each compound condition holds a nested compound condition of its own.
+        """
+        count = self.settings['conditions']
+        levels = self.settings['depth'] + 1
+        lines = ['<?xml version="1.0" encoding="UTF-8" ?>', '<xfragment>']
+
+        for index in range(count):
+            level = index % levels
+            cid = self.condition_id(index)
+            if level == 0:
+                lines += ['  <condition type="variable" id="{0}">'.format(cid),
+                          '    <name>{0}</name>'.format(self.pick(self.variable_id, self.settings['variables'], 'variable')),
+                          '    <value>true</value>',
+                          '  </condition>']
+                continue
+
+            below = [candidate for candidate in (index - 1, index - 1 - levels) if candidate >= 0]
+            refs = [self.condition_id(candidate) for candidate in below]
+            if self.random.random() < self.settings['undefined']:
+                refs.append('undefined.condition.{0}'.format(index))
+
+            lines.append('  <condition type="{0}" id="{1}">'.format(['and', 'or'][index % 2], cid))
+            for ref in refs:
+                lines.append('    <condition type="ref" refid="{0}"/>'.format(ref))
+            lines += ['    <condition type="not">',
+                      '      <condition type="ref" refid="{0}"/>'.format(refs[0]),
+                      '    </condition>',
+                      '  </condition>']
+
+        lines.append('</xfragment>')
+        self.write(os.path.join(self.specs_path, 'conditions.xml'), lines)
+
+    def write_variables(self):
+        lines = ['<?xml version="1.0" encoding="UTF-8" ?>', '<xfragment>']
+        for index in range(self.settings['variables']):
+            lines.append('  <variable name="{0}" value="value.{1}"/>'.format(self.variable_id(index), index))
+        lines.append('</xfragment>')
+        self.write(os.path.join(self.specs_path, 'variables.xml'), lines)
+
+        self.write(os.path.join(self.specs_path, 'dynamic_variables.xml'), [
+            '<?xml version="1.0" encoding="UTF-8" ?>',
+            '<xfragment>',
+            '  <variable name="bench.dynamic.variable" value="${{{0}}}"/>'.format(self.variable_id(0)),
+            '</xfragment>'])
+
+    def write_strings(self):
+        lines = ['<langpack>']
+        for index in range(self.settings['strings']):
+            lines.append('    <str id="{0}" txt="Benchmark string {1}."/>'.format(self.string_id(index), index))
+        lines.append('</langpack>')
+        self.write(os.path.join(self.resources_path, 'langpacks', 'CustomLangPack.xml'), lines)
+
+    def write_specs(self):
+        """
+        Writes the panels, packs, user input and process panel specs, which refer to conditions,
+        variables, strings and classes.
+        """
+        conditions = self.settings['conditions']
+        variables = self.settings['variables']
+        strings = self.settings['strings']
+        panels = max(1, conditions / 20)
+
+        lines = ['<?xml version="1.0" encoding="UTF-8" ?>', '<xfragment>']
+        for index in range(panels):
+            lines.append('  <panel classname="UserInputPanel" id="bench.panel.{0}" condition="{1}"/>'.format(
+                index, self.pick(self.condition_id, conditions, 'condition')))
+        lines.append('</xfragment>')
+        self.write(os.path.join(self.specs_path, 'panels.xml'), lines)
+
+        lines = ['<?xml version="1.0" encoding="UTF-8" ?>', '<xfragment>']
+        for index in range(max(1, panels / 4)):
+            lines += ['  <pack name="bench.pack.{0}" required="no" condition="{1}">'.format(
+                      index, self.pick(self.condition_id, conditions, 'condition')),
+                      '    <description>Benchmark pack</description>',
+                      '  </pack>']
+        lines.append('</xfragment>')
+        self.write(os.path.join(self.specs_path, 'packs.xml'), lines)
+
+        lines = ['<userInput>']
+        for index in range(panels):
+            lines += ['  <panel id="bench.panel.{0}">'.format(index),
+                      '    <field type="title" id="{0}"/>'.format(self.pick(self.string_id, strings, 'string')),
+                      '    <field type="text" variable="{0}" conditionid="{1}">'.format(
+                          self.pick(self.variable_id, variables, 'variable'),
+                          self.pick(self.condition_id, conditions, 'condition')),
+                      '      <spec id="{0}" size="15"/>'.format(self.pick(self.string_id, strings, 'string')),
+                      '    </field>',
+                      '  </panel>']
+        lines.append('</userInput>')
+        self.write(os.path.join(self.resources_path, 'userInputSpec.xml'), lines)
+
+        lines = ['<processing>']
+        for index in range(min(self.settings['java_files'], 10)):
+            lines += ['  <job name="Job {0}" condition="{1}">'.format(
+                      index, self.pick(self.condition_id, conditions, 'condition')),
+                      '    <executeclass name="{0}"/>'.format(self.class_id(self.settings['java_files'] - 1 - index)),
+                      '  </job>']
+        lines.append('</processing>')
+        self.write(os.path.join(self.specs_path, 'ProcessPanel.Spec.xml'), lines)
+
+    def write_sources(self):
+        """
+        Each Java file imports the next one, declares a few String constants, and makes its share
+        of references to conditions, variables and strings, directly or through the constants.
+        """
+        java_files = self.settings['java_files']
+        references = [
+            ('idata.getVariable({0})', self.variable_id, self.settings['variables'], 'variable'),
+            ('idata.getRules().isConditionTrue({0})', self.condition_id, self.settings['conditions'], 'condition'),
+            ('idata.langpack.getString({0})', self.string_id, self.settings['strings'], 'string')
+        ]
+
+        for index in range(java_files):
+            class_id = self.class_id(index)
+            package, name = class_id.rsplit('.', 1)
+            lines = ['package {0};'.format(package),
+                     '',
+                     'import com.izforge.izpack.installer.AutomatedInstallData;']
+            if index + 1 < java_files:
+                lines.append('import {0};'.format(self.class_id(index + 1)))
+            lines += ['',
+                      'public class {0} {{'.format(name),
+                      '']
+
+            constants = []
+            body = []
+            for reference in range(self.settings['density']):
+                call, id_fn, count, prefix = references[reference % len(references)]
+                key = '"{0}"'.format(self.pick(id_fn, count, prefix))
+                if reference % 4 == 3:
+                    constant = 'KEY_{0}'.format(reference)
+                    constants.append('    public static final String {0} = {1};'.format(constant, key))
+                    key = constant
+                if reference % 7 == 6:
+                    body.append('        // {0};'.format(call.format(key)))
+                else:
+                    body.append('        String value{0} = {1};'.format(reference, call.format(key)))
+
+            lines += constants
+            lines += ['',
+                      '    public void run(AutomatedInstallData idata) {']
+            lines += body
+            lines += ['    }',
+                      '}']
+
+            path = os.path.join(self.sources_path, *class_id.split('.')) + '.java'
+            if not os.path.isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            self.write(path, lines)
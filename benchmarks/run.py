@@ -0,0 +1,173 @@
+"""
+Benchmark suite: generates a synthetic installer and source tree (see generator.py), then times every
+public IzVerifier entry point against it.
+
+Each entry point is timed on a freshly constructed IzVerifier, taking the best of a number of repeats.
+Results are appended to benchmarks/results/results.jsonl along with the current git commit, and compared
+with the last stored result for the same knobs and arguments, so regressions between commits show up.
+
+Usage, from the root of the repository:
+
+    python benchmarks/run.py [--conditions N] [--depth D] [--variables M] [--strings K]
+                             [--java-files F] [--density R] [--repeat 3] [--arg scanner=grep] ...
+"""
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from IzVerifier.izverifier import IzVerifier
+import generator
+
+__author__ = 'fcanas'
+
+RESULTS_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results', 'results.jsonl')
+
+
+def entry_points(args):
+    """
+    Returns the list of timed entry points, as (name, needs verifier, function) tuples. Functions
+    that need a verifier are passed a freshly constructed one, built outside of the timing.
+    """
+    points = [
+        ('IzVerifier', False, lambda verifier: IzVerifier(args)),
+        ('_find_all_referenced_classes', True, lambda verifier: verifier._find_all_referenced_classes()),
+        ('verify_all', True, lambda verifier: verifier.verify_all()),
+        ('verify_all(filter_classes)', True, lambda verifier: verifier.verify_all(filter_classes=True)),
+        ('dependency_verification', True,
+         lambda verifier: verifier.dependency_verification(fail_on_undefined_vars=True)),
+        ('find_code_references_many', True,
+         lambda verifier: verifier.find_code_references_many(verifier.specifications)),
+        ('find_references', True, lambda verifier: verifier.find_references('bench.condition.1')),
+        ('find_references_many', True,
+         lambda verifier: verifier.find_references_many(['bench.condition.{0}'.format(index) for index in range(50)])),
+    ]
+    for specification in ['conditions', 'variables', 'strings']:
+        points += [
+            ('verify({0})'.format(specification), True,
+             lambda verifier, spec=specification: verifier.verify(spec)),
+            ('find_code_references({0})'.format(specification), True,
+             lambda verifier, spec=specification: verifier.find_code_references(spec)),
+            ('find_specification_references({0})'.format(specification), True,
+             lambda verifier, spec=specification: verifier.find_specification_references(spec)),
+        ]
+    return points
+
+
+def time_entry_points(args, repeat):
+    """
+    Returns a dict mapping each entry point's name to its best time in seconds.
+    """
+    timings = {}
+    for name, needs_verifier, fn in entry_points(args):
+        best = None
+        for attempt in range(repeat):
+            verifier = IzVerifier(args) if needs_verifier else None
+            start = time.time()
+            fn(verifier)
+            elapsed = time.time() - start
+            if best is None or elapsed < best:
+                best = elapsed
+        timings[name] = best
+    return timings
+
+
+def current_commit():
+    """
+    Returns the current git commit, or None outside of a git checkout.
+    """
+    try:
+        with open(os.devnull, 'w') as devnull:
+            return subprocess.check_output(['git', 'rev-parse', '--short', 'HEAD'], stderr=devnull).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def load_results(path):
+    """
+    Returns all results stored at path.
+    """
+    if not os.path.exists(path):
+        return []
+    with open(path) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_result(path, result):
+    if not os.path.isdir(os.path.dirname(path)):
+        os.makedirs(os.path.dirname(path))
+    with open(path, 'a') as f:
+        f.write(json.dumps(result, sort_keys=True) + '\n')
+
+
+def report(result, previous):
+    """
+    Prints the timings of result, compared with those of the previous result if there is one.
+    """
+    if previous:
+        print 'Compared with commit {0} ({1}):'.format(previous['commit'], previous['date'])
+    width = max(len(name) for name in result['timings'])
+    for name in sorted(result['timings']):
+        line = '{0:<{1}}  {2:9.4f}s'.format(name, width, result['timings'][name])
+        if previous and name in previous['timings'] and previous['timings'][name] > 0:
+            change = (result['timings'][name] - previous['timings'][name]) / previous['timings'][name]
+            line += '  {0:+7.1%}'.format(change)
+        print line
+
+
+def parse_arguments(argv):
+    parser = argparse.ArgumentParser(description='Times IzVerifier entry points on a synthetic installer.')
+    for knob in ['conditions', 'depth', 'variables', 'strings', 'java_files', 'density', 'seed']:
+        parser.add_argument('--' + knob.replace('_', '-'), dest=knob, type=int, default=generator.DEFAULTS[knob])
+    parser.add_argument('--undefined', type=float, default=generator.DEFAULTS['undefined'])
+    parser.add_argument('--repeat', type=int, default=3, help='repeats per entry point, the best is kept')
+    parser.add_argument('--arg', action='append', default=[],
+                        help='extra IzVerifier argument, as key=value (ints are converted)')
+    parser.add_argument('--results', default=RESULTS_PATH, help='path of the results file')
+    parser.add_argument('--no-save', dest='save', action='store_false', help="don't store the results")
+    return parser.parse_args(argv)
+
+
+def main(argv):
+    options = parse_arguments(argv)
+    knobs = dict((knob, getattr(options, knob)) for knob in generator.DEFAULTS)
+
+    extra = {}
+    for arg in options.arg:
+        key, value = arg.split('=', 1)
+        extra[key] = int(value) if value.isdigit() else value
+
+    root = tempfile.mkdtemp(prefix='izverifier-bench-')
+    try:
+        args = generator.generate(root, **knobs)
+        args.update(extra)
+        timings = time_entry_points(args, options.repeat)
+    finally:
+        shutil.rmtree(root)
+
+    result = {
+        'commit': current_commit(),
+        'date': time.strftime('%Y-%m-%d %H:%M:%S'),
+        'knobs': knobs,
+        'args': extra,
+        'timings': timings
+    }
+
+    previous = None
+    for stored in load_results(options.results):
+        if stored['knobs'] == knobs and stored['args'] == extra:
+            previous = stored
+
+    report(result, previous)
+    if options.save:
+        save_result(options.results, result)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])